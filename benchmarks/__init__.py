@@ -0,0 +1 @@
+# Latency and peak-memory benchmarks for the FinClusters hot paths
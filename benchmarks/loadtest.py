@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from finclusters import ROOT
+from finclusters.data_sources import load_table
+from finclusters.registry import REGISTRY
+from finclusters.store import read_sector_frame
+
+# === Multi-Session Load Test ===
+# Starts the app with `streamlit run` against the fake market-data backend and
+# drives N concurrent browser sessions over Streamlit's websocket protocol.
+# (AppTest swaps a process-wide Runtime on every run, so it cannot host
+# concurrent sessions; a real server also shares st.cache_* the way a
+# deployment does.)
+#
+# python -m benchmarks.loadtest --sessions 20 --iterations 3
+# python -m benchmarks.loadtest --sessions 50 --latency 0.2 --json load.json
+# python -m benchmarks.loadtest --url http://localhost:8501 --sessions 10
+PAGES = ("Peer_Cluster", "Expected_Return", "Price_Forecast")
+TICKER_LABEL = "Enter stock ticker"
+RF_LABEL = "Enter Risk-Free Rate (%)"
+
+
+def ticker_pool(seed=0):
+    # Active tickers with model coefficients and clustered rows, interleaved across the sectors;
+    # others make the Peer Cluster page show an error, which the run would count as a failure
+    active = set(load_table('active_companies')['Ticker'].str.upper())
+    clustered = {s: set(read_sector_frame(s)['tic'].astype(str).str.upper()) for s in REGISTRY}
+    coeff_df = load_table('coefficients')
+    by_sector = {}
+    for ticker, sector in zip(coeff_df['ticker'].str.upper(), coeff_df['sector'].astype(str)):
+        if sector in REGISTRY and ticker in active and ticker in clustered[sector]:
+            by_sector.setdefault(sector, []).append(ticker)
+    rng = random.Random(seed)
+    for tickers in by_sector.values():
+        rng.shuffle(tickers)
+    pool = []
+    for group in zip(*by_sector.values()):
+        pool.extend(group)
+    return pool
+
+
+# === Server ===
+def start_server(port, latency):
+    env = dict(
+        os.environ,
+        FINCLUSTERS_MARKET_BACKEND='fake',
+        FINCLUSTERS_FAKE_LATENCY=str(latency),
+        # Fake quotes must never end up in the app's real market-data cache
+        FINCLUSTERS_MARKET_CACHE=str(Path(tempfile.mkdtemp()) / 'market_data.sqlite'),
+    )
+    cmd = [
+        sys.executable, '-m', 'streamlit', 'run', str(ROOT / 'streamlit_app.py'),
+        '--server.headless', 'true', '--server.port', str(port),
+        '--server.enableXsrfProtection', 'false', '--browser.gatherUsageStats', 'false',
+    ]
+    process = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://localhost:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return process, url
+        except OSError:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("streamlit did not become healthy within 60s")
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    out = subprocess.run(['ps', '-o', 'rss=', '-p', str(pid)], capture_output=True, text=True).stdout.strip()
+    return int(out) / 1024 if out else float('nan')
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.samples.append(rss_mb(self.pid))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.samples.append(rss_mb(self.pid))
+
+
+# === Browser Session ===
+class Session:
+    # One websocket connection = one Streamlit session with its own session_state
+    def __init__(self, url):
+        from websockets.sync.client import connect
+
+        self.ws = connect(
+            url.replace('http', 'ws', 1) + "/_stcore/stream", subprotocols=["streamlit"], max_size=None
+        )
+        self.page_hashes = {}
+        self.page_hash = ""
+        self.widget_ids = {}
+        self.widgets = {}
+
+    def close(self):
+        self.ws.close()
+
+    def rerun(self, page=None, **values):
+        # Seconds until the server reports the script run finished, and any errors shown:
+        # uncaught exceptions plus st.error alerts (the pages catch most failures themselves)
+        from streamlit.proto.Alert_pb2 import Alert
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        if page is not None:
+            self.page_hash = self.page_hashes[page]
+        for label, value in values.items():
+            self.widgets[label] = value
+
+        msg = BackMsg()
+        msg.rerun_script.page_script_hash = self.page_hash
+        for label, value in self.widgets.items():
+            if label in self.widget_ids:
+                state = msg.rerun_script.widget_states.widgets.add()
+                state.id = self.widget_ids[label]
+                if isinstance(value, str):
+                    state.string_value = value
+                else:
+                    state.double_value = value
+
+        start = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        errors = []
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(self.ws.recv())
+            kind = fwd.WhichOneof('type')
+            if kind == 'script_finished':
+                return time.perf_counter() - start, errors
+            if kind == 'navigation':
+                self.page_hashes = {p.url_pathname: p.page_script_hash for p in fwd.navigation.app_pages}
+            elif kind == 'delta' and fwd.delta.WhichOneof('type') == 'new_element':
+                element = fwd.delta.new_element
+                field = element.WhichOneof('type')
+                if field == 'exception':
+                    errors.append(element.exception.message)
+                elif field == 'alert' and element.alert.format == Alert.ERROR:
+                    errors.append(element.alert.body)
+                elif field in ('text_input', 'number_input'):
+                    # Widget ids depend on the widget's arguments, so track the latest one per label
+                    widget = getattr(element, field)
+                    self.widget_ids[widget.label] = widget.id
+
+
+def walk(url, tickers, rf_percent=4.0):
+    # Enter each ticker, then Step 1 -> Step 2 (plus a risk-free rate change) -> Step 3
+    timings = []
+    session = Session(url)
+    try:
+        timings.append(('connect', *session.rerun()))
+        for ticker in tickers:
+            timings.append(('enter ticker', *session.rerun(**{TICKER_LABEL: ticker})))
+            for page in PAGES:
+                timings.append((page, *session.rerun(page)))
+                if page == 'Expected_Return':
+                    rf_percent = round(rf_percent + 0.25, 2)
+                    timings.append(('change rf', *session.rerun(**{RF_LABEL: rf_percent})))
+    finally:
+        session.close()
+    return timings
+
+
+# === Report ===
+def summarize(timings, wall):
+    steps = {}
+    for step, seconds, _ in timings:
+        steps.setdefault(step, []).append(seconds)
+
+    def stats(values):
+        values = np.asarray(values)
+        return {
+            'count': len(values),
+            'p50_s': float(np.percentile(values, 50)),
+            'p95_s': float(np.percentile(values, 95)),
+            'max_s': float(values.max()),
+        }
+
+    return {
+        'steps': {step: stats(values) for step, values in steps.items()},
+        'overall': stats([seconds for _, seconds, _ in timings]),
+        'errors': sum(len(errors) for _, _, errors in timings),
+        'wall_s': wall,
+        'reruns_per_s': len(timings) / wall,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent FinClusters sessions and report rerun latency.")
+    parser.add_argument('--sessions', type=int, default=10, help="Concurrent browser sessions")
+    parser.add_argument('--iterations', type=int, default=2, help="Tickers each session walks through")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds per fake Yahoo Finance call")
+    parser.add_argument('--ramp', type=float, default=0.0, help="Spread session starts over this many seconds")
+    parser.add_argument('--port', type=int, default=8599)
+    parser.add_argument('--url', help="Drive an already running app instead of starting one (no RSS report)")
+    parser.add_argument('--cold', action='store_true', help="Skip the warm-up pass that fills the shared caches")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Write the report to this file")
+    args = parser.parse_args(argv)
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args.port, args.latency)
+    try:
+        pool = ticker_pool(args.seed)
+        if not args.cold:
+            # One ticker per sector, so timed sessions measure steady state
+            walk(url, pool[:len(REGISTRY)])
+
+        sampler = RssSampler(process.pid) if process else None
+        if sampler:
+            sampler.start()
+
+        def run_session(i):
+            time.sleep(args.ramp * i / max(args.sessions, 1))
+            start = i * args.iterations
+            tickers = [pool[(start + j) % len(pool)] for j in range(args.iterations)]
+            return walk(url, tickers)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+            results = list(executor.map(run_session, range(args.sessions)))
+        wall = time.perf_counter() - start
+
+        report = summarize([t for session in results for t in session], wall)
+        report['sessions'] = args.sessions
+        report['iterations'] = args.iterations
+        report['fake_latency_s'] = args.latency
+        if sampler:
+            sampler.stop()
+            report['rss_mb'] = {
+                'start': sampler.samples[0],
+                'peak': max(sampler.samples),
+                'end': sampler.samples[-1],
+                'per_session': (sampler.samples[-1] - sampler.samples[0]) / args.sessions,
+            }
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print(f"{args.sessions} sessions x {args.iterations} tickers, fake latency {args.latency}s")
+    print(f"{'step':<18}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for step, s in [*report['steps'].items(), ('all reruns', report['overall'])]:
+        print(f"{step:<18}{s['count']:>7}{s['p50_s'] * 1e3:>10.1f}{s['p95_s'] * 1e3:>10.1f}{s['max_s'] * 1e3:>10.1f}")
+    print(f"throughput {report['reruns_per_s']:.1f} reruns/s over {report['wall_s']:.1f}s, {report['errors']} script errors")
+    if 'rss_mb' in report:
+        rss = report['rss_mb']
+        print(f"server RSS {rss['start']:.0f} MB -> peak {rss['peak']:.0f} MB, end {rss['end']:.0f} MB "
+              f"(~{rss['per_session']:.1f} MB per session)")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Market data always comes from the offline fake backend
+os.environ['FINCLUSTERS_MARKET_BACKEND'] = 'fake'
+
+from finclusters import market_data
+from finclusters.charts import build_cluster_figure
+from finclusters.data_sources import load_table
+from finclusters.forecast import GROWTH_RATES, RISK_FREE_RATES, gordon_price, premium_axis, price_grid
+from finclusters.ratios import RAW_FIELDS, engineer
+from finclusters.registry import REGISTRY
+from finclusters.returns import FORWARD_MARKET_PREMIUM, build_coefficient_matrix, expected_returns, factor_matrix
+from finclusters.sectors import build_peer_index, read_models, sector_path
+from finclusters.store import read_sector_frame
+
+# === Benchmark Suite ===
+# python -m benchmarks.run                          all benchmarks at 1x/10x/100x
+# python -m benchmarks.run --scale 1 --json out.json
+# python -m benchmarks.run --compare out.json       exit 1 on regressions
+REPRESENTATIVE_TICKERS = {'GICS_35': 'ABT', 'GICS_25': 'BBY', 'GICS_45': 'AAPL'}
+DEFAULT_SCALES = (1, 10, 100)
+
+
+# === Synthetic Scaling ===
+def scale_sector_frame(df, factor, seed=0):
+    # factor copies of every ticker-year under new ticker names, with jittered coordinates
+    if factor == 1:
+        return df
+    rng = np.random.default_rng(seed)
+    tickers = df['tic'].astype(str)
+    copies = []
+    for i in range(factor):
+        copy = df.copy()
+        copy['tic'] = tickers if i == 0 else tickers + f".{i}"
+        copies.append(copy)
+    scaled = pd.concat(copies, ignore_index=True)
+    for col in ('pca_1', 'pca_2'):
+        scaled[col] = scaled[col] + rng.normal(0, 0.01, len(scaled)).astype(scaled[col].dtype)
+    return scaled
+
+
+def scale_coefficients(coeff_df, factor):
+    if factor == 1:
+        return coeff_df
+    copies = [coeff_df] + [coeff_df.assign(ticker=coeff_df['ticker'] + f".{i}") for i in range(1, factor)]
+    return pd.concat(copies, ignore_index=True)
+
+
+def scale_compustat(df, factor):
+    # factor copies of every company under new gvkeys
+    if factor == 1:
+        return df
+    return pd.concat([df.assign(gvkey=df['gvkey'] + i * 10_000_000) for i in range(factor)], ignore_index=True)
+
+
+def scaled_active(active_tickers, factor):
+    return frozenset(
+        t if i == 0 else f"{t}.{i}" for t in active_tickers for i in range(factor)
+    )
+
+
+# === Measurement ===
+def measure(fn, repeat):
+    fn()  # warm-up (imports, first-touch allocations)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'peak_mb': peak / 1e6}
+
+
+def benchmarks(scale):
+    # name -> zero-argument callable, built on bundled data scaled `scale` times
+    cases = {}
+    coeff_df = scale_coefficients(load_table('coefficients'), scale)
+    active = scaled_active(frozenset(load_table('active_companies')['Ticker'].str.upper()), scale)
+
+    for sector_key in REGISTRY:
+        df = scale_sector_frame(read_sector_frame(sector_key), scale)
+        ticker = REPRESENTATIVE_TICKERS[sector_key]
+        if scale == 1:
+            cases[f'{sector_key}/load_bundle'] = lambda k=sector_key: (read_models(k), read_sector_frame(k))
+        cases[f'{sector_key}/build_peer_index'] = lambda df=df: build_peer_index(df, active)
+
+        peer_index = build_peer_index(df, active)
+        if ticker in peer_index:
+            cluster_id = int(df['cluster'].iloc[peer_index.company_row(ticker)])
+            cases[f'{sector_key}/peer_lookup'] = (
+                lambda p=peer_index, t=ticker, df=df: p.peers(int(df['cluster'].iloc[p.company_row(t)]))
+            )
+
+            coeff_matrix = build_coefficient_matrix(coeff_df)
+            peers = peer_index.peers(cluster_id)
+            factors = factor_matrix(capm_premium=FORWARD_MARKET_PREMIUM)
+            cases[f'{sector_key}/peer_expected_returns'] = (
+                lambda m=coeff_matrix, p=peers: expected_returns(m, m.rows(p), factors, 0.04)
+            )
+        cases[f'{sector_key}/pca_figure'] = lambda df=df: build_cluster_figure(df)
+        cases[f'{sector_key}/pca_figure_sampled'] = lambda df=df: build_cluster_figure(df, 'sample')
+
+    cases['coefficients/build_matrix'] = lambda: build_coefficient_matrix(coeff_df)
+    coeff_matrix = build_coefficient_matrix(coeff_df)
+    all_rows = np.arange(len(coeff_matrix.tickers))
+    cases['coefficients/all_expected_returns'] = lambda: expected_returns(coeff_matrix, all_rows, factor_matrix(), 0.04)
+
+    raw = pd.read_csv(sector_path('GICS_35', 'data'), usecols=['gvkey', 'tic', 'fyear', *RAW_FIELDS])
+    raw = scale_compustat(raw, scale)
+    cases['ratios/engineer'] = lambda: engineer(raw)
+
+    cases['forecast/gordon_price'] = lambda: [gordon_price(5.0, r) for r in np.linspace(0.0, 0.2, 100 * scale)]
+    cases['forecast/price_grid'] = lambda: price_grid(5.0, premium_axis(0.04), GROWTH_RATES, RISK_FREE_RATES)
+    if scale == 1:
+        cases['market_data/price_history_slices'] = lambda: [
+            market_data.get_price_history('AAPL').series(tf) for tf in ("1M", "1Y", "Max")
+        ]
+    return cases
+
+
+def run(scales, repeat, pattern=None):
+    results = {}
+    for scale in scales:
+        for name, fn in benchmarks(scale).items():
+            key = f'{name}@{scale}x'
+            if pattern and pattern not in key:
+                continue
+            results[key] = measure(fn, repeat)
+            r = results[key]
+            print(f"{key:<48} {r['median_s'] * 1e3:>10.3f} ms  (min {r['min_s'] * 1e3:.3f})  peak {r['peak_mb']:>8.2f} MB")
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric in ('median_s', 'peak_mb'):
+            if base[metric] > 0 and r[metric] > base[metric] * threshold:
+                regressions.append(f"{key} {metric}: {base[metric]:.6g} -> {r[metric]:.6g}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FinClusters data loading, peer lookup and return math.")
+    parser.add_argument('--scale', type=int, nargs='+', default=list(DEFAULT_SCALES), help="Dataset scale factors")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('-k', dest='pattern', help="Only benchmarks whose name contains this text")
+    parser.add_argument('--json', help="Write results to this file")
+    parser.add_argument('--compare', help="Baseline JSON from a previous --json run")
+    parser.add_argument('--threshold', type=float, default=1.5, help="Allowed slowdown / memory growth ratio")
+    args = parser.parse_args(argv)
+
+    # Keep the fake market data out of the app's real cache
+    market_data.CACHE_PATH = Path(tempfile.mkdtemp()) / 'market_data.sqlite'
+    results = run(args.scale, args.repeat, args.pattern)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
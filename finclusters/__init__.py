@@ -0,0 +1,5 @@
+# Shared data, model and analytics helpers used by the FinClusters pages
+from pathlib import Path
+
+# Artifacts live in the repository root next to streamlit_app.py
+ROOT = Path(__file__).resolve().parent.parent
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from finclusters.instrumentation import timed, track_cache
+from finclusters.registry import MAX_LOADED_SECTORS
+from finclusters.sectors import data_version, load_models_and_data
+
+# === PCA Cluster Figure ===
+# plotly is imported inside the builders so pages that never draw the chart skip it
+# Above this many ticker-years the page offers sampled / density views
+POINT_THRESHOLD = 5000
+SAMPLE_POINTS = 2000
+
+RENDER_MODES = {
+    'webgl': "All points (WebGL)",
+    'sample': "Stratified sample per cluster",
+    'density': "Density",
+}
+
+
+def stratified_sample(df, max_points, seed=0):
+    # Keep each cluster's share of points, with at least a few points per cluster
+    if len(df) <= max_points:
+        return df
+    per_cluster = (df['cluster'].value_counts() / len(df) * max_points).clip(lower=10).round().astype(int)
+    parts = [
+        group.sample(n=min(len(group), per_cluster[cluster_id]), random_state=seed)
+        for cluster_id, group in df.groupby('cluster')
+    ]
+    return pd.concat(parts).sort_index()
+
+
+def _points_trace(df):
+    import plotly.graph_objects as go
+
+    # Hover text is built here rather than added as a column to the cached df
+    hover_text = df['tic'].astype(str).to_numpy() + " | Year: " + df['fyear'].astype(str).to_numpy()
+    return go.Scattergl(
+        x=df['pca_1'].to_numpy(), y=df['pca_2'].to_numpy(),
+        mode='markers',
+        marker=dict(
+            color=df['cluster'].to_numpy(), colorscale='Viridis', opacity=0.6,
+            colorbar=dict(title='cluster'),
+        ),
+        hovertext=hover_text,
+        hovertemplate="<b>%{hovertext}</b><br>cluster=%{marker.color}<extra></extra>",
+        showlegend=False,
+    )
+
+
+def _density_traces(df):
+    import plotly.graph_objects as go
+
+    centroids = df.groupby('cluster')[['pca_1', 'pca_2']].mean()
+    return [
+        go.Histogram2d(
+            x=df['pca_1'].to_numpy(), y=df['pca_2'].to_numpy(),
+            nbinsx=60, nbinsy=60, colorscale='Viridis',
+            colorbar=dict(title='count'), hovertemplate="count=%{z}<extra></extra>",
+        ),
+        go.Scattergl(
+            x=centroids['pca_1'].to_numpy(), y=centroids['pca_2'].to_numpy(),
+            mode='markers+text', text=[f"Cluster {int(c)}" for c in centroids.index],
+            textposition='bottom center', marker=dict(color='white', size=8, line=dict(color='black', width=1)),
+            name='Cluster centers',
+        ),
+    ]
+
+
+@timed('plotly: cluster figure')
+def build_cluster_figure(df, mode='webgl'):
+    import plotly.graph_objects as go
+
+    if mode == 'density':
+        traces = _density_traces(df)
+    else:
+        traces = [_points_trace(stratified_sample(df, SAMPLE_POINTS) if mode == 'sample' else df)]
+    fig = go.Figure(traces)
+    fig.update_layout(
+        title='PCA Cluster View ', height=600, width=900,
+        xaxis_title='pca_1', yaxis_title='pca_2',
+    )
+    return fig.to_dict()
+
+
+@track_cache(st.cache_resource(max_entries=MAX_LOADED_SECTORS * len(RENDER_MODES)))
+def _base_cluster_figure(sector_key, mode, version):
+    _, _, _, df, _ = load_models_and_data(sector_key, version)
+    return build_cluster_figure(df, mode)
+
+
+def base_cluster_figure(sector_key, mode='webgl', version=None):
+    # Built once per sector, mode and data version, kept as a plain dict so each rerun
+    # only appends the selected-company marker instead of rebuilding every point
+    version = data_version(sector_key) if version is None else version
+    return _base_cluster_figure(sector_key, mode, version)
+
+
+def cluster_figure(sector_key, company, ticker, mode='webgl', path=None, version=None):
+    # path: optional (fyear, pca_1, pca_2) frame drawn as the company's trajectory
+    import plotly.graph_objects as go
+
+    base = base_cluster_figure(sector_key, mode, version)
+    traces = list(base['data'])
+    if path is not None and len(path) > 1:
+        traces.append(go.Scattergl(
+            x=path['pca_1'], y=path['pca_2'],
+            mode='lines+markers',
+            line=dict(color='black', width=1.5),
+            marker=dict(color='black', size=6),
+            text=path['fyear'].astype(str),
+            hovertemplate="FY%{text}<br>PCA 1 %{x:.2f}<br>PCA 2 %{y:.2f}<extra></extra>",
+            name=f'{ticker} by fiscal year'
+        ).to_plotly_json())
+    # Highlight selected company
+    marker = go.Scattergl(
+        x=[company['pca_1']], y=[company['pca_2']],
+        mode='markers+text',
+        marker=dict(color='red', size=12, line=dict(color='black', width=1)),
+        text=[ticker],
+        textposition='top center',
+        name='Selected Company'
+    ).to_plotly_json()
+    return {'data': [*traces, marker], 'layout': base['layout']}
+
+
+# === Price Scenario Heatmap ===
+def scenario_heatmap(grid, premia, growth_rates, risk_free_rates, current_rf=None):
+    # One frame per risk-free rate with a plotly slider, so scrubbing the rate
+    # happens in the browser instead of triggering Streamlit reruns
+    import plotly.graph_objects as go
+
+    finite = grid[np.isfinite(grid)]
+    zmin, zmax = (np.percentile(finite, [1, 99]) if finite.size else (0, 1))
+    x = growth_rates * 100
+    y = premia * 100
+
+    def heatmap(i):
+        # grid[i] is (growth, premium); plotly wants z as (len(y), len(x))
+        return go.Heatmap(
+            z=grid[i].T, x=x, y=y, zmin=zmin, zmax=zmax, colorscale='Viridis',
+            colorbar=dict(title='Price'),
+            hovertemplate="Growth %{x:.2f}%<br>Premium %{y:.2f}%<br>Price %{z:.2f}<extra></extra>",
+        )
+
+    start = 0
+    if current_rf is not None:
+        start = int(np.abs(risk_free_rates - current_rf).argmin())
+
+    labels = [f"{rf * 100:.2f}%" for rf in risk_free_rates]
+    fig = go.Figure(
+        data=[heatmap(start)],
+        frames=[go.Frame(data=[heatmap(i)], name=labels[i]) for i in range(len(risk_free_rates))],
+    )
+    fig.update_layout(
+        height=550,
+        xaxis_title='Terminal growth (%)',
+        yaxis_title='Expected return over risk-free (%)',
+        sliders=[dict(
+            active=start,
+            currentvalue=dict(prefix='Risk-free rate: '),
+            steps=[
+                dict(method='animate', label=label,
+                     args=[[label], dict(mode='immediate', frame=dict(duration=0, redraw=True), transition=dict(duration=0))])
+                for label in labels
+            ],
+        )],
+    )
+    return fig
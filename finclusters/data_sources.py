@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from finclusters import ROOT
+from finclusters.instrumentation import count, timed
+
+logger = logging.getLogger(__name__)
+
+# === Bundled Reference Tables ===
+# The app always serves the copy shipped in the repo (or a newer copy fetched
+# earlier), so page loads never wait on raw.githubusercontent.com.
+DATA_SOURCES = {
+    'active_companies': {
+        'file': 'Active_Companies.csv',
+        'url': "https://raw.githubusercontent.com/PraewLao/price-and-peers-app/refs/heads/main/Active_Companies.csv",
+    },
+    'coefficients': {
+        'file': 'sector_model_coefficients_by_ticker_REPLACEMENT.csv',
+        'url': "https://raw.githubusercontent.com/PraewLao/price-and-peers-app/main/sector_model_coefficients_by_ticker_REPLACEMENT.csv",
+    },
+}
+
+# Downloaded copies and their ETag/Last-Modified metadata
+CACHE_DIR = ROOT / '.cache' / 'data_sources'
+
+# Seconds between background revalidations against the remote; 0 keeps the app fully offline
+REMOTE_TTL = float(os.environ.get('FINCLUSTERS_REMOTE_TTL', '0'))
+
+_lock = threading.Lock()
+_tables = {}       # name -> parsed DataFrame shared by every session in the process
+_versions = {}     # name -> int, bumped whenever a newer copy is swapped in
+_checked_at = {}   # name -> time of the last remote revalidation
+_refreshing = set()
+
+
+def _cached_path(name):
+    return CACHE_DIR / DATA_SOURCES[name]['file']
+
+
+def _meta_path(name):
+    return CACHE_DIR / f"{DATA_SOURCES[name]['file']}.json"
+
+
+def _local_path(name):
+    # Prefer a previously revalidated download over the bundled file
+    cached = _cached_path(name)
+    return cached if cached.exists() else ROOT / DATA_SOURCES[name]['file']
+
+
+def _read_meta(name):
+    try:
+        return json.loads(_meta_path(name).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _revalidate(name):
+    import requests
+
+    try:
+        meta = _read_meta(name)
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        count('network_calls', f'github: {name}')
+        with timed(f'github fetch: {name}'):
+            response = requests.get(DATA_SOURCES[name]['url'], headers=headers, timeout=10)
+        if response.status_code == 304:
+            return
+        response.raise_for_status()
+
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = _cached_path(name).with_suffix('.tmp')
+        tmp.write_bytes(response.content)
+        df = pd.read_csv(tmp)
+        os.replace(tmp, _cached_path(name))
+        _meta_path(name).write_text(json.dumps({
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }))
+
+        with _lock:
+            _tables[name] = df
+            _versions[name] = _versions.get(name, 0) + 1
+        logger.info("Refreshed %s from remote", name)
+    except Exception as e:
+        logger.warning("Could not revalidate %s: %s", name, e)
+    finally:
+        with _lock:
+            _checked_at[name] = time.time()
+            _refreshing.discard(name)
+
+
+def _maybe_revalidate(name):
+    # Called with _lock held; the fetch itself runs in a daemon thread
+    if REMOTE_TTL <= 0 or name in _refreshing:
+        return
+    if time.time() - _checked_at.get(name, 0) < REMOTE_TTL:
+        return
+    _refreshing.add(name)
+    threading.Thread(target=_revalidate, args=(name,), daemon=True).start()
+
+
+def load_table(name):
+    # Callers share one parsed copy, so treat the returned DataFrame as read-only
+    with _lock:
+        df = _tables.get(name)
+        if df is None:
+            with timed(f'read csv: {name}'):
+                df = pd.read_csv(_local_path(name))
+            _tables[name] = df
+            _versions.setdefault(name, 0)
+        _maybe_revalidate(name)
+        return df
+
+
+def table_version(name):
+    load_table(name)
+    return _versions[name]
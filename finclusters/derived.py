@@ -0,0 +1,164 @@
+import numpy as np
+import streamlit as st
+
+from finclusters.forecast import TERMINAL_GROWTH, gordon_price
+from finclusters.instrumentation import count, timed
+from finclusters.market_data import get_info
+from finclusters.registry import REGISTRY
+from finclusters.returns import FORWARD_MARKET_PREMIUM, expected_returns, factor_matrix, load_coefficient_matrix
+from finclusters.sectors import data_version, load_peer_index, load_models_and_data
+
+# === Derived Session Data ===
+# ticker -> sector -> cluster -> peers -> returns -> prices, computed on demand
+# by whichever page asks first and memoized per session. Each node's key is its
+# own inputs plus its upstream keys, so changing the risk-free rate only
+# recomputes the return and price nodes, and changing the ticker recomputes all.
+FALLBACK_RF_PERCENT = 4.0
+
+NODES = {}
+
+
+def node(*inputs, deps=()):
+    def register(compute):
+        NODES[compute.__name__] = (inputs, deps, compute)
+        return compute
+    return register
+
+
+class DerivedState:
+    def __init__(self):
+        self.memo = {}   # node -> (key, value)
+
+    def key(self, name, values):
+        inputs, deps, _ = NODES[name]
+        return tuple(values[i] for i in inputs) + tuple(self.key(d, values) for d in deps)
+
+    def get(self, name, values):
+        key = self.key(name, values)
+        hit = self.memo.get(name)
+        if hit is not None and hit[0] == key:
+            count('derived_hits', name)
+            return hit[1]
+        count('derived_misses', name)
+        inputs, deps, compute = NODES[name]
+        upstream = {d: self.get(d, values) for d in deps}
+        with timed(f'derived: {name}'):
+            value = compute(*(values[i] for i in inputs), **upstream)
+        self.memo[name] = (key, value)
+        return value
+
+
+# Get default 10-year treasury yield from Yahoo Finance (via the shared market-data cache)
+def default_rf_percent():
+    try:
+        rf_yield = get_info("^TNX")["regularMarketPrice"] / 100
+        return round(rf_yield * 100, 2)
+    except Exception:
+        return FALLBACK_RF_PERCENT
+
+
+def current_inputs():
+    # Inputs set by page widgets, with defaults so any page can be opened first
+    rf = st.session_state.get("risk_free_rate")
+    return {
+        'ticker': st.session_state.get("ticker", "").upper(),
+        'rf': rf if rf is not None else default_rf_percent() / 100,
+        'use_forward': st.session_state.get("use_forward_premium", False),
+        'use_rolling': st.session_state.get("use_rolling_betas", False),
+    }
+
+
+def get(name):
+    state = st.session_state.get("derived")
+    if state is None:
+        state = st.session_state["derived"] = DerivedState()
+    return state.get(name, current_inputs())
+
+
+# === Nodes ===
+@node('ticker')
+def sector(ticker):
+    coeff_matrix = load_coefficient_matrix()
+    if ticker not in coeff_matrix:
+        return None
+    return coeff_matrix.sector[coeff_matrix.row[ticker]]
+
+
+@node('ticker', deps=('sector',))
+def cluster(ticker, sector):
+    # {'sector', 'cluster', 'row', 'version'} for the ticker's latest fiscal year, or None
+    if sector not in REGISTRY:
+        return None
+    version = data_version(sector)
+    peer_index = load_peer_index(sector, version)
+    if ticker not in peer_index:
+        return None
+    _, _, _, df, _ = load_models_and_data(sector, version)
+    row = peer_index.company_row(ticker)
+    return {'sector': sector, 'cluster': int(df['cluster'].iloc[row]), 'row': row, 'version': version}
+
+
+@node(deps=('cluster',))
+def peers(cluster):
+    if cluster is None:
+        return ()
+    return load_peer_index(cluster['sector'], cluster['version']).peers(cluster['cluster'])
+
+
+@node('ticker', 'rf', 'use_forward', 'use_rolling')
+def model_return(ticker, rf, use_forward, use_rolling):
+    # {'model', 'sector', 'forward_toggle', 'expected_return'} or None when the ticker has no coefficients
+    coeff_matrix = load_coefficient_matrix(rolling=use_rolling)
+    if ticker not in coeff_matrix:
+        return None
+    rows = coeff_matrix.rows([ticker])
+    model_type = coeff_matrix.model[rows[0]]
+    sector_code = coeff_matrix.sector[rows[0]]
+    # Forward-looking premium toggle only applies to CAPM in GICS_35 / GICS_45
+    forward_toggle = model_type == "CAPM" and sector_code in ["GICS_35", "GICS_45"]
+    capm_premium = FORWARD_MARKET_PREMIUM if forward_toggle and use_forward else None
+    value = expected_returns(coeff_matrix, rows, factor_matrix(capm_premium=capm_premium), rf)[0]
+    return {
+        'model': model_type,
+        'sector': sector_code,
+        'forward_toggle': forward_toggle,
+        'expected_return': None if np.isnan(value) else float(value),
+    }
+
+
+@node('rf', 'use_rolling', deps=('peers',))
+def peer_returns(rf, use_rolling, peers):
+    # {ticker: expected return} for peers with usable coefficients; CAPM peers use the forward premium
+    coeff_matrix = load_coefficient_matrix(rolling=use_rolling)
+    rows = coeff_matrix.rows(peers)
+    values = expected_returns(coeff_matrix, rows, factor_matrix(capm_premium=FORWARD_MARKET_PREMIUM), rf)
+    ok = ~np.isnan(values)
+    return dict(zip(coeff_matrix.tickers[rows][ok].tolist(), values[ok].tolist()))
+
+
+@node(deps=('peer_returns',))
+def peer_range(peer_returns):
+    if not peer_returns:
+        return None
+    values = list(peer_returns.values())
+    return min(values), max(values)
+
+
+@node('ticker', deps=('model_return', 'peer_range'))
+def prices(ticker, model_return, peer_range):
+    # Gordon prices from the cached market data; forward EPS is re-read through the TTL cache
+    stock_info = get_info(ticker)
+    forward_eps = stock_info.get("forwardEps", None)
+    forward_pe = stock_info.get("forwardPE", None)
+    expected = model_return['expected_return'] if model_return else None
+
+    peer_price_min = peer_price_max = None
+    if forward_eps and peer_range is not None:
+        peer_price_min = gordon_price(forward_eps, peer_range[1], TERMINAL_GROWTH)
+        peer_price_max = gordon_price(forward_eps, peer_range[0], TERMINAL_GROWTH)
+    return {
+        'model_price': gordon_price(forward_eps, expected, TERMINAL_GROWTH),
+        'peer_price_min': peer_price_min,
+        'peer_price_max': peer_price_max,
+        'analyst_price': forward_pe * forward_eps if forward_pe and forward_eps else None,
+    }
@@ -0,0 +1,314 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from finclusters.data_sources import load_table
+from finclusters.returns import BETA_HISTORY_PATH, MODEL_FACTORS, MODELS, N_FACTORS
+
+# === Batched Factor-Model Estimation ===
+# Refits the coefficient table from a long monthly returns panel and factor
+# series. Every ticker is solved at once from stacked normal equations: missing
+# months are masked out of X'X and X'y, so ragged histories need no loop.
+# Model selection follows the Methodology page: train Jan 2000 - Dec 2018,
+# test Jan 2019 onwards, best model per GICS sector by test RMSE (or MAE).
+FACTOR_COLUMNS = ['mkt', 'smb', 'hml', 'mom']   # same order as coef_1..coef_4
+FACTOR_ALIASES = {
+    'mktrf': 'mkt', 'mkt-rf': 'mkt', 'mkt_rf': 'mkt', 'mkt': 'mkt',
+    'smb': 'smb', 'hml': 'hml', 'mom': 'mom', 'umd': 'mom', 'rf': 'rf', 'date': 'date',
+}
+TRAIN_END = pd.Period('2018-12', 'M')
+TEST_START = pd.Period('2019-01', 'M')
+MIN_OBS = 24        # months needed to fit a ticker
+MIN_TEST_OBS = 12   # months needed to score a ticker out of sample
+METRICS = ('rmse', 'mae')
+OUTPUT_COLUMNS = ['ticker', 'sector', 'model', 'intercept'] + [f'coef_{i}' for i in range(1, N_FACTORS + 1)] + ['cluster']
+
+
+# === Inputs ===
+def to_months(values):
+    # 'YYYYMM' integers (Ken French files) or any date pandas can parse -> monthly periods
+    text = pd.Series(values).astype(str).str.strip()
+    if text.str.fullmatch(r'\d{6}').all():
+        return pd.PeriodIndex(pd.to_datetime(text, format='%Y%m'), freq='M')
+    return pd.PeriodIndex(pd.to_datetime(text), freq='M')
+
+
+def read_factors(path, percent=False):
+    # date, Mkt-RF, SMB, HML, MOM/UMD, RF -> monthly frame of mkt, smb, hml, mom, rf
+    df = pd.read_csv(path)
+    df = df.rename(columns=lambda c: FACTOR_ALIASES.get(str(c).strip().lower(), c))
+    missing = [c for c in ('date', 'mkt', 'rf') if c not in df.columns]
+    if missing:
+        raise ValueError(f"{path}: factor file needs {', '.join(missing)}")
+    df.index = to_months(df['date'])
+    df = df.reindex(columns=FACTOR_COLUMNS + ['rf']).astype(float)
+    if percent:
+        df = df / 100
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+
+def read_panel(path):
+    # ticker, date, ret (decimal monthly return), optional sector
+    df = pd.read_csv(path)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    missing = [c for c in ('ticker', 'date', 'ret') if c not in df.columns]
+    if missing:
+        raise ValueError(f"{path}: returns panel needs {', '.join(missing)}")
+    df['ticker'] = df['ticker'].astype(str).str.upper()
+    df['date'] = to_months(df['date'])
+    df['ret'] = pd.to_numeric(df['ret'], errors='coerce')
+    return df
+
+
+def sector_key(value):
+    # 35, 35.0, '35' or 'GICS_35' -> 'GICS_35'
+    if pd.isna(value):
+        return None
+    text = str(value).strip()
+    if text.startswith('GICS_'):
+        return text
+    try:
+        return f"GICS_{int(float(text))}"
+    except ValueError:
+        return None
+
+
+def ticker_sectors(panel):
+    # The panel's own sector column, then Active_Companies.csv, then the current coefficient table
+    sectors = {}
+    coeff_df = load_table('coefficients')
+    sectors.update(zip(coeff_df['ticker'].astype(str).str.upper(), coeff_df['sector'].map(sector_key)))
+    active = load_table('active_companies')
+    sectors.update(zip(active['Ticker'].astype(str).str.upper(), active['GIC_Sector'].map(sector_key)))
+    if 'sector' in panel.columns:
+        latest = panel.dropna(subset=['sector']).drop_duplicates('ticker', keep='last')
+        sectors.update(zip(latest['ticker'], latest['sector'].map(sector_key)))
+    return {t: s for t, s in sectors.items() if s}
+
+
+def panel_arrays(panel, factors):
+    # months (T,), tickers (N,), excess returns Y (T, N) with NaN gaps, design X (T, 5)
+    wide = panel.pivot_table(index='date', columns='ticker', values='ret', aggfunc='last')
+    months = wide.index.intersection(factors.index).sort_values()
+    wide = wide.reindex(months)
+    f = factors.reindex(months)
+    Y = wide.to_numpy(dtype=float) - f['rf'].to_numpy()[:, None]
+    X = np.column_stack([np.ones(len(months)), f[FACTOR_COLUMNS].to_numpy(dtype=float)])
+    return months, wide.columns.to_numpy(), Y, X
+
+
+# === Batched Least Squares ===
+def fit_batch(X, Y, n_factors, min_obs=MIN_OBS):
+    # OLS of every column of Y on [1, first n_factors of X]; rows where Y or the
+    # factors are NaN drop out of that ticker's sums. Returns (N, 1 + n_factors)
+    # coefficients (NaN below min_obs) and the (T, N) mask of months used.
+    Xk = X[:, :n_factors + 1]
+    p = Xk.shape[1]
+    mask = ~np.isnan(Y) & ~np.isnan(Xk).any(axis=1)[:, None]
+    W = mask.astype(float)
+    Xz = np.nan_to_num(Xk)
+
+    # (N, T) @ (T, p*p) -> every ticker's X'X in one matmul; X'y likewise
+    XtX = (W.T @ (Xz[:, :, None] * Xz[:, None, :]).reshape(len(Xz), p * p)).reshape(-1, p, p)
+    Xty = (Xz.T @ np.where(mask, Y, 0.0)).T
+
+    beta = np.full((Y.shape[1], p), np.nan)
+    ok = W.sum(axis=0) >= max(min_obs, p + 1)
+    if ok.any():
+        beta[ok] = _solve(XtX[ok], Xty[ok])
+    return beta, mask
+
+
+def _solve(XtX, Xty):
+    try:
+        return np.linalg.solve(XtX, Xty[:, :, None])[:, :, 0]
+    except np.linalg.LinAlgError:
+        # A singular ticker (e.g. a constant factor over its window) fails the whole batch
+        return (np.linalg.pinv(XtX) @ Xty[:, :, None])[:, :, 0]
+
+
+def rolling_betas(X, Y, n_factors, window, min_obs=MIN_OBS):
+    # (T, N, 1 + n_factors) coefficients over each trailing `window` months. One
+    # pass over time: every ticker's X'X and X'y gain the newest month and drop
+    # the one leaving the window, then all tickers are solved together.
+    Xk = X[:, :n_factors + 1]
+    T, p = Xk.shape
+    mask = ~np.isnan(Y) & ~np.isnan(Xk).any(axis=1)[:, None]
+    W = mask.astype(float)
+    Xz = np.nan_to_num(Xk)
+    Yz = np.where(mask, Y, 0.0)
+    outer = Xz[:, :, None] * Xz[:, None, :]
+
+    XtX = np.zeros((Y.shape[1], p, p))
+    Xty = np.zeros((Y.shape[1], p))
+    nobs = np.zeros(Y.shape[1])
+    betas = np.full((T, Y.shape[1], p), np.nan)
+    need = max(min(min_obs, window), p + 1)
+    for t in range(T):
+        XtX += W[t][:, None, None] * outer[t]
+        Xty += Yz[t][:, None] * Xz[t]
+        nobs += W[t]
+        if t >= window:
+            old = t - window
+            XtX -= W[old][:, None, None] * outer[old]
+            Xty -= Yz[old][:, None] * Xz[old]
+            nobs -= W[old]
+        ok = nobs >= need
+        if ok.any():
+            betas[t, ok] = _solve(XtX[ok], Xty[ok])
+    return betas
+
+
+def test_errors(X, Y, beta, n_factors, test):
+    # (T_test, N) out-of-sample errors, NaN where the month is missing or the ticker unfitted
+    Xk = X[test, :n_factors + 1]
+    return Y[test] - Xk @ beta.T
+
+
+# === Model Selection ===
+def select_models(months, tickers, sectors, Y, X, metric='rmse', train_end=TRAIN_END, test_start=TEST_START):
+    # Per-sector pooled test RMSE/MAE of each model over the tickers every model
+    # could fit and score, and the winner per sector
+    train = months <= train_end
+    test = months >= test_start
+    if not train.any() or not test.any():
+        raise ValueError(f"returns must cover both the training (to {train_end}) and test (from {test_start}) periods")
+
+    available = [m for m in MODELS if not np.isnan(X[:, 1:MODEL_FACTORS[m] + 1]).all(axis=0).any()]
+    errors = {}
+    for model in available:
+        beta, _ = fit_batch(X[train], Y[train], MODEL_FACTORS[model])
+        errors[model] = test_errors(X, Y, beta, MODEL_FACTORS[model], test)
+    scored = np.logical_and.reduce([(~np.isnan(e)).sum(axis=0) >= MIN_TEST_OBS for e in errors.values()])
+
+    sector_of = np.array([sectors.get(t) for t in tickers], dtype=object)
+    rows = []
+    for sector in sorted({s for s in sector_of if s}):
+        members = scored & (sector_of == sector)
+        for model in available:
+            e = errors[model][:, members]
+            rows.append({
+                'sector': sector,
+                'model': model,
+                'tickers': int(members.sum()),
+                'rmse': float(np.sqrt(np.nanmean(e ** 2))) if members.any() else np.nan,
+                'mae': float(np.nanmean(np.abs(e))) if members.any() else np.nan,
+            })
+    scores = pd.DataFrame(rows, columns=['sector', 'model', 'tickers', *METRICS])
+    # Ties and unscored sectors fall to the simpler model, which comes first in MODELS
+    best = scores.fillna({metric: np.inf}).sort_values(metric, kind='stable').drop_duplicates('sector')
+    scores['selected'] = scores.index.isin(best.index)
+    return scores, dict(zip(best['sector'], best['model']))
+
+
+def estimate(panel, factors, metric='rmse', train_only=False, clusters=None):
+    # -> (coefficient table in the app's schema, per-sector model scores)
+    months, tickers, Y, X = panel_arrays(panel, factors)
+    sectors = ticker_sectors(panel)
+    scores, chosen = select_models(months, tickers, sectors, Y, X, metric)
+
+    fit_rows = months <= TRAIN_END if train_only else np.ones(len(months), dtype=bool)
+    sector_of = np.array([sectors.get(t) for t in tickers], dtype=object)
+    frames = []
+    for model in MODELS:
+        picked = np.array([chosen.get(s) == model for s in sector_of], dtype=bool)
+        if not picked.any():
+            continue
+        k = MODEL_FACTORS[model]
+        beta, _ = fit_batch(X[fit_rows], Y[fit_rows][:, picked], k)
+        coefs = np.full((len(beta), N_FACTORS), np.nan)
+        coefs[:, :k] = beta[:, 1:]
+        frame = pd.DataFrame(coefs, columns=OUTPUT_COLUMNS[4:8])
+        frame.insert(0, 'ticker', tickers[picked])
+        frame.insert(1, 'sector', sector_of[picked])
+        frame.insert(2, 'model', model)
+        frame.insert(3, 'intercept', beta[:, 0])
+        frames.append(frame[~np.isnan(beta[:, 0])])
+
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=OUTPUT_COLUMNS[:-1])
+    table['cluster'] = table['ticker'].map(clusters or {}).astype(float)
+    return table[OUTPUT_COLUMNS], scores
+
+
+def beta_history(panel, factors, table, window):
+    # Rolling coefficients of every ticker in `table` under its selected model
+    months, tickers, Y, X = panel_arrays(panel, factors)
+    column = {t: i for i, t in enumerate(tickers.tolist())}
+    names = table['ticker'].to_numpy()
+    models = table['model'].to_numpy()
+    betas = np.full((len(months), len(table), N_FACTORS + 1), np.nan)
+    for model in MODELS:
+        picked = np.flatnonzero(models == model)
+        if len(picked):
+            k = MODEL_FACTORS[model]
+            cols = [column[t] for t in names[picked]]
+            betas[:, picked, :k + 1] = rolling_betas(X, Y[:, cols], k, window)
+    return months.strftime('%Y-%m').to_numpy(), names, models, betas
+
+
+def save_beta_history(path, months, tickers, models, window, betas):
+    # Written beside the old file and swapped in, like the sector stores
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.savez(
+            f, months=months.astype(str), tickers=tickers.astype(str), model=models.astype(str),
+            window=np.int32(window), betas=betas.astype(np.float32)
+        )
+    os.replace(tmp, path)
+    return path
+
+
+# === CLI ===
+# python -m finclusters.factor_models monthly_returns.csv ff_factors.csv --percent -o coefficients.csv
+# python -m finclusters.factor_models returns.csv factors.csv -o coefficients.csv --rolling 60
+# python -m finclusters.factor_models returns.csv factors.csv --metric mae --train-only -o coefficients.csv
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit CAPM, FF3 and Carhart for every ticker and write a coefficient table.")
+    parser.add_argument('returns', help="Long CSV of monthly returns: ticker, date, ret[, sector]")
+    parser.add_argument('factors', help="Monthly factor CSV: date, Mkt-RF, SMB, HML, MOM/UMD, RF")
+    parser.add_argument('-o', '--output', required=True, help="Coefficient CSV to write (same columns as the app's table)")
+    parser.add_argument('--percent', action='store_true', help="Factor file is in percent, as Ken French publishes it")
+    parser.add_argument('--metric', choices=METRICS, default='rmse', help="Test-period metric used to pick each sector's model")
+    parser.add_argument('--train-only', action='store_true', help="Report training-period coefficients instead of refitting on all months")
+    parser.add_argument('--rolling', type=int, metavar='MONTHS', help="Also estimate rolling betas over this window, e.g. 36 or 60")
+    parser.add_argument('--history', default=str(BETA_HISTORY_PATH), help="Where --rolling writes the beta history (default: the file the app reads)")
+    parser.add_argument('--no-clusters', action='store_true', help="Leave the cluster column empty instead of loading the sector models")
+    args = parser.parse_args(argv)
+
+    try:
+        panel = read_panel(args.returns)
+        factors = read_factors(args.factors, args.percent)
+        clusters = None
+        if not args.no_clusters:
+            from finclusters.sectors import latest_clusters
+
+            latest = latest_clusters()
+            clusters = dict(zip(latest['Ticker'], latest['Cluster']))
+        table, scores = estimate(panel, factors, args.metric, args.train_only, clusters)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    for sector, group in scores.groupby('sector'):
+        print(f"{sector} ({group['tickers'].iloc[0]} tickers scored)")
+        for row in group.itertuples():
+            mark = '*' if row.selected else ' '
+            print(f"  {mark} {row.model:<8} rmse {row.rmse:.5f}  mae {row.mae:.5f}")
+    unassigned = panel['ticker'].nunique() - len(table)
+    table.to_csv(args.output, index=False)
+    print(f"wrote {len(table)} tickers -> {args.output} ({unassigned} without a sector or enough months)")
+
+    if args.rolling:
+        months, tickers, models, betas = beta_history(panel, factors, table, args.rolling)
+        save_beta_history(args.history, months, tickers, models, args.rolling, betas)
+        print(f"wrote {args.rolling}-month rolling betas for {len(tickers)} tickers x {len(months)} months -> {args.history}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
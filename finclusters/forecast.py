@@ -0,0 +1,34 @@
+import numpy as np
+
+# Long-term GDP growth proxy used as the Gordon terminal growth rate
+TERMINAL_GROWTH = 0.03
+
+# Default scenario axes (decimal rates)
+PREMIUM_SPREAD = 0.05
+GROWTH_RATES = np.round(np.arange(0.0, 0.0601, 0.0025), 4)
+RISK_FREE_RATES = np.round(np.arange(0.0, 0.0801, 0.0025), 4)
+
+
+def gordon_price(forward_eps, expected_return, terminal_growth=TERMINAL_GROWTH):
+    # Price = EPS / (r - g); None when inputs are missing or r <= g
+    if not forward_eps or expected_return is None or not expected_return > terminal_growth:
+        return None
+    return forward_eps / (expected_return - terminal_growth)
+
+
+def premium_axis(center, spread=PREMIUM_SPREAD, step=0.0025):
+    # Return premia over the risk-free rate, centred on the model's premium
+    return np.round(np.arange(center - spread, center + spread + step / 2, step), 6)
+
+
+def price_grid(forward_eps, premia, growth_rates, risk_free_rates):
+    # Gordon price for every (risk-free, growth, premium) cell in one broadcast.
+    # Returns shape (len(risk_free_rates), len(growth_rates), len(premia)); cells
+    # where expected return (premium + rf) <= growth are NaN.
+    premia = np.asarray(premia, dtype=float)[None, None, :]
+    growth_rates = np.asarray(growth_rates, dtype=float)[None, :, None]
+    risk_free_rates = np.asarray(risk_free_rates, dtype=float)[:, None, None]
+    spread = premia + risk_free_rates - growth_rates
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prices = forward_eps / spread
+    return np.where(spread > 0, prices, np.nan)
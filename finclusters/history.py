@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from finclusters.instrumentation import timed, track_cache
+from finclusters.registry import MAX_LOADED_SECTORS
+from finclusters.sectors import data_version, load_models_and_data
+
+
+# === Cluster History ===
+# Every ticker's fiscal years sorted into one set of arrays, with each ticker's
+# years as a contiguous slice (ticker -> offsets[i]:offsets[i + 1]), plus
+# cluster-to-cluster transition counts between consecutive fiscal years.
+@dataclass(frozen=True)
+class ClusterHistory:
+    tickers: np.ndarray      # (n,) upper-case tickers
+    row: dict                # ticker -> index into tickers / offsets
+    offsets: np.ndarray      # (n + 1,) start of each ticker's slice in the arrays below
+    fyear: np.ndarray        # (rows,) sorted by ticker, then fiscal year
+    cluster: np.ndarray
+    pca_1: np.ndarray
+    pca_2: np.ndarray
+    years: np.ndarray        # (Y,) fiscal year each transition ends in
+    transitions: np.ndarray  # (Y, k, k) companies moving from cluster i in year - 1 to j in year
+
+    def __contains__(self, ticker):
+        return ticker in self.row
+
+    def path(self, ticker):
+        # The ticker's (fyear, cluster, pca_1, pca_2) rows in year order
+        i = self.row[ticker]
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return pd.DataFrame({
+            'fyear': self.fyear[rows],
+            'cluster': self.cluster[rows],
+            'pca_1': self.pca_1[rows],
+            'pca_2': self.pca_2[rows],
+        })
+
+    def migration(self, year=None):
+        # (k, k) row-normalized transition probabilities, pooled over all years or for one;
+        # rows for clusters nobody left from are NaN
+        counts = self.transitions.sum(axis=0) if year is None else self.transitions[np.searchsorted(self.years, year)]
+        totals = counts.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(totals > 0, counts / totals, np.nan)
+
+
+@timed('build cluster history')
+def build_cluster_history(df):
+    tickers = df['tic'].astype(str).str.upper().to_numpy()
+    fyear = df['fyear'].to_numpy().astype(int)
+    order = np.lexsort((fyear, tickers))
+    tickers, fyear = tickers[order], fyear[order]
+    cluster = df['cluster'].to_numpy().astype(int)[order]
+
+    # Ticker runs in the sorted arrays
+    starts = np.flatnonzero(np.append(True, tickers[1:] != tickers[:-1]))
+    offsets = np.append(starts, len(tickers))
+    names = tickers[starts]
+
+    # Consecutive fiscal years of the same ticker are one transition
+    step = (tickers[1:] == tickers[:-1]) & (fyear[1:] == fyear[:-1] + 1)
+    k = int(cluster.max()) + 1 if len(cluster) else 0
+    years = np.unique(fyear[1:][step])
+    transitions = np.zeros((len(years), k, k), dtype=np.int32)
+    np.add.at(transitions, (np.searchsorted(years, fyear[1:][step]), cluster[:-1][step], cluster[1:][step]), 1)
+
+    pca = {col: df[col].to_numpy(dtype=float)[order] if col in df.columns else np.full(len(order), np.nan) for col in ('pca_1', 'pca_2')}
+    return ClusterHistory(
+        names, {t: i for i, t in enumerate(names.tolist())}, offsets,
+        fyear, cluster, pca['pca_1'], pca['pca_2'], years, transitions
+    )
+
+
+@track_cache(st.cache_resource(max_entries=MAX_LOADED_SECTORS))
+def _cluster_history(sector_key, version):
+    _, _, _, df, _ = load_models_and_data(sector_key, version)
+    return build_cluster_history(df)
+
+
+def load_cluster_history(sector_key, version=None):
+    # Rebuilt only when the sector data changes
+    version = data_version(sector_key) if version is None else version
+    return _cluster_history(sector_key, version)
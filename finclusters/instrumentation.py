@@ -0,0 +1,161 @@
+import functools
+import json
+import os
+import threading
+import time
+
+# === Stage Timers and Counters ===
+# Set FINCLUSTERS_DEBUG=1 to record per-stage timings, cache hits/misses and
+# network calls for the whole process. When it is off, `timed` hands back a
+# shared no-op and the decorators return the function unchanged.
+ENABLED = os.environ.get('FINCLUSTERS_DEBUG') == '1'
+
+_lock = threading.Lock()
+_timers = {}     # stage -> [count, total, max, last] in seconds
+_counters = {}   # (metric, name) -> int
+_local = threading.local()
+
+
+def observe(stage, seconds):
+    if not ENABLED:
+        return
+    with _lock:
+        timer = _timers.get(stage)
+        if timer is None:
+            _timers[stage] = [1, seconds, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+            timer[3] = seconds
+
+
+def count(metric, name, n=1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[metric, name] = _counters.get((metric, name), 0) + n
+
+
+class _Stage:
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class _Disabled:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, func):
+        return func
+
+
+_DISABLED = _Disabled()
+
+
+def timed(stage):
+    # `with timed('stage'):` or `@timed('stage')`
+    return _Stage(stage) if ENABLED else _DISABLED
+
+
+def track_cache(cache):
+    # Wraps an st.cache_resource / st.cache_data decorator and counts hits and
+    # misses per function: a miss is a call that ran the function body.
+    def decorate(func):
+        if not ENABLED:
+            return cache(func)
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            _local.missed = True
+            with _Stage(f'compute: {name}'):
+                return func(*args, **kwargs)
+
+        cached = cache(compute)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            # Saved and restored so nested cached calls are counted separately
+            outer = getattr(_local, 'missed', False)
+            _local.missed = False
+            try:
+                return cached(*args, **kwargs)
+            finally:
+                count('cache_misses' if _local.missed else 'cache_hits', name)
+                _local.missed = outer
+
+        call.clear = cached.clear
+        return call
+    return decorate
+
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+# === Export ===
+def snapshot():
+    with _lock:
+        timers = {stage: list(values) for stage, values in _timers.items()}
+        counters = dict(_counters)
+    return {
+        'timers': {
+            stage: {'count': n, 'total': total, 'mean': total / n, 'max': worst, 'last': last}
+            for stage, (n, total, worst, last) in sorted(timers.items())
+        },
+        'counters': {
+            metric: {name: value for (m, name), value in sorted(counters.items()) if m == metric}
+            for metric in sorted({m for m, _ in counters})
+        },
+    }
+
+
+def to_json(data=None):
+    return json.dumps(data or snapshot(), indent=2)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(data=None):
+    data = data or snapshot()
+    lines = [
+        "# HELP finclusters_stage_seconds Time spent in each instrumented stage.",
+        "# TYPE finclusters_stage_seconds summary",
+    ]
+    for stage, timer in data['timers'].items():
+        lines.append(f'finclusters_stage_seconds_count{{stage="{_label(stage)}"}} {timer["count"]}')
+        lines.append(f'finclusters_stage_seconds_sum{{stage="{_label(stage)}"}} {timer["total"]:.6f}')
+    lines.append("# HELP finclusters_stage_seconds_max Slowest observed run of each stage.")
+    lines.append("# TYPE finclusters_stage_seconds_max gauge")
+    for stage, timer in data['timers'].items():
+        lines.append(f'finclusters_stage_seconds_max{{stage="{_label(stage)}"}} {timer["max"]:.6f}')
+    for metric, values in data['counters'].items():
+        lines.append(f"# TYPE finclusters_{metric}_total counter")
+        for name, value in values.items():
+            lines.append(f'finclusters_{metric}_total{{name="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from finclusters import ROOT
+from finclusters.registry import REGISTRY, file_sha256, manifest
+from finclusters.sectors import read_models, sector_path
+from finclusters.store import read_sector_frame
+
+# === k Selection and Cluster Stability ===
+# Re-runs the elbow analysis behind each sector's k from the Methodology page.
+# For every k: best-of-N KMeans restarts (inertia), a sampled silhouette, and
+# stability as the mean adjusted Rand index between the full-data clustering
+# and clusterings fitted on bootstrap resamples. Fits run in a process pool;
+# results are cached per sector and only recomputed when its data changes.
+K_RANGE = (2, 12)
+RESTARTS = 10
+BOOTSTRAPS = 20
+SILHOUETTE_SAMPLE = 5000
+CACHE_PATH = ROOT / '.cache' / 'k_selection.json'
+
+_matrices = {}   # sector -> standardized feature matrix, set once per worker
+
+
+def feature_matrix(sector_key):
+    # Complete rows of the sector's model features, standardized like the training data.
+    # Features the data never stored (e.g. SGA_Sales for GICS_45) are left out.
+    df = read_sector_frame(sector_key)
+    features = [f for f in manifest(sector_key).features if f in df.columns]
+    X = df[features].dropna().to_numpy(dtype=float)
+    std = X.std(axis=0)
+    return (X - X.mean(axis=0)) / np.where(std > 0, std, 1), features
+
+
+def cache_key(sector_key, params):
+    digest = hashlib.sha256(file_sha256(sector_path(sector_key, 'data')).encode())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def read_cache(path=CACHE_PATH):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_cache(cache, path=CACHE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(cache, indent=2))
+    os.replace(tmp, path)
+
+
+def elbow(ks, inertia):
+    # k furthest below the straight line from the first to the last point of the curve
+    ks = np.asarray(ks, dtype=float)
+    y = np.asarray(inertia, dtype=float)
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    y = (y - y[-1]) / (y[0] - y[-1])
+    return int(ks[np.argmax(1 - x - y)])
+
+
+# === Pool Tasks ===
+def _init_worker(matrices):
+    # One BLAS/OpenMP thread per process, or the pool oversubscribes the cores
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(1)
+    _matrices.update(matrices)
+
+
+def _restart(sector_key, k, seed):
+    from sklearn.cluster import KMeans
+
+    model = KMeans(n_clusters=k, n_init=1, random_state=seed).fit(_matrices[sector_key])
+    return model.inertia_, model.labels_.astype(np.int8)
+
+
+def _silhouette(sector_key, labels, sample, seed):
+    from sklearn.metrics import silhouette_score
+
+    Z = _matrices[sector_key]
+    return float(silhouette_score(Z, labels, sample_size=min(sample, len(Z)), random_state=seed))
+
+
+def _bootstrap(sector_key, k, reference, seed):
+    # Fit on a resample, label every row, and compare with the full-data clustering
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import adjusted_rand_score
+
+    Z = _matrices[sector_key]
+    rows = np.random.default_rng(seed).integers(0, len(Z), len(Z))
+    model = KMeans(n_clusters=k, n_init=1, random_state=seed).fit(Z[rows])
+    return float(adjusted_rand_score(reference, model.predict(Z)))
+
+
+# === Sweep ===
+def evaluate(sectors, params, workers=None):
+    # sector -> {'features', 'rows', 'k': [...], 'inertia', 'silhouette', 'stability', 'elbow'}
+    k_min, k_max = params['k_range']
+    ks = list(range(k_min, k_max + 1))
+    matrices = {}
+    features = {}
+    for sector_key in sectors:
+        matrices[sector_key], features[sector_key] = feature_matrix(sector_key)
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(matrices,)) as pool:
+        restarts = {
+            (s, k, seed): pool.submit(_restart, s, k, seed)
+            for s in sectors for k in ks for seed in range(params['restarts'])
+        }
+        best = {}
+        for (s, k, _), future in restarts.items():
+            inertia, labels = future.result()
+            if (s, k) not in best or inertia < best[s, k][0]:
+                best[s, k] = (inertia, labels)
+
+        silhouettes = {
+            (s, k): pool.submit(_silhouette, s, labels, params['silhouette_sample'], params['seed'])
+            for (s, k), (_, labels) in best.items()
+        }
+        bootstraps = {
+            (s, k, b): pool.submit(_bootstrap, s, k, labels, params['seed'] + b)
+            for (s, k), (_, labels) in best.items() for b in range(params['bootstraps'])
+        }
+        stability = {}
+        for (s, k, _), future in bootstraps.items():
+            stability.setdefault((s, k), []).append(future.result())
+
+    results = {}
+    for s in sectors:
+        inertia = [float(best[s, k][0]) for k in ks]
+        results[s] = {
+            'features': features[s],
+            'rows': len(matrices[s]),
+            'k': ks,
+            'inertia': inertia,
+            'silhouette': [silhouettes[s, k].result() for k in ks],
+            'stability': [float(np.mean(stability[s, k])) for k in ks],
+            'elbow': elbow(ks, inertia),
+        }
+    return results
+
+
+def run(sectors, params, workers=None, refresh=False, cache_path=CACHE_PATH):
+    # Cached results for unchanged sectors, fresh ones for the rest; returns (results, recomputed)
+    cache = read_cache(cache_path)
+    keys = {s: cache_key(s, params) for s in sectors}
+    stale = [s for s in sectors if refresh or cache.get(s, {}).get('key') != keys[s]]
+    if stale:
+        for s, result in evaluate(stale, params, workers).items():
+            cache[s] = {'key': keys[s], **result}
+        write_cache(cache, cache_path)
+    return {s: cache[s] for s in sectors}, stale
+
+
+# === CLI ===
+# python -m finclusters.k_selection                       every sector, cached
+# python -m finclusters.k_selection GICS_35 --k-max 15 --workers 8
+# python -m finclusters.k_selection --refresh --json k_selection.json
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep k for each sector's KMeans model: inertia, silhouette and bootstrap stability.")
+    parser.add_argument('sectors', nargs='*', help=f"Sectors to evaluate (default: all of {', '.join(sorted(REGISTRY))})")
+    parser.add_argument('--k-min', type=int, default=K_RANGE[0])
+    parser.add_argument('--k-max', type=int, default=K_RANGE[1])
+    parser.add_argument('--restarts', type=int, default=RESTARTS, help="KMeans restarts per k; the lowest inertia is kept")
+    parser.add_argument('--bootstrap', type=int, default=BOOTSTRAPS, help="Bootstrap resamples per k for the stability score")
+    parser.add_argument('--sample', type=int, default=SILHOUETTE_SAMPLE, help="Rows sampled for the silhouette")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help="Processes in the pool (default: one per CPU)")
+    parser.add_argument('--refresh', action='store_true', help="Ignore cached results")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    unknown = [s for s in args.sectors if s not in REGISTRY]
+    if unknown:
+        parser.error(f"unknown sector(s): {', '.join(unknown)}")
+    if not 2 <= args.k_min < args.k_max:
+        parser.error("need 2 <= --k-min < --k-max")
+    params = {
+        'k_range': [args.k_min, args.k_max],
+        'restarts': args.restarts,
+        'bootstraps': args.bootstrap,
+        'silhouette_sample': args.sample,
+        'seed': args.seed,
+    }
+    sectors = args.sectors or list(REGISTRY)
+    results, recomputed = run(sectors, params, args.workers, args.refresh)
+
+    for sector_key, result in results.items():
+        _, kmeans, _ = read_models(sector_key)
+        source = "recomputed" if sector_key in recomputed else "cached"
+        print(f"{sector_key}: {result['rows']} rows, {len(result['features'])} features ({source})")
+        missing = [f for f in manifest(sector_key).features if f not in result['features']]
+        if missing:
+            print(f"  not in the data, left out: {', '.join(missing)}")
+        print(f"  {'k':>3}{'inertia':>12}{'silhouette':>12}{'stability':>11}")
+        for k, inertia, silhouette, stability in zip(result['k'], result['inertia'], result['silhouette'], result['stability']):
+            notes = [n for n, hit in (("model", k == kmeans.n_clusters), ("elbow", k == result['elbow'])) if hit]
+            print(f"  {k:>3}{inertia:>12.1f}{silhouette:>12.3f}{stability:>11.3f}  {', '.join(notes)}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
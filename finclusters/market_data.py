@@ -0,0 +1,342 @@
+import hashlib
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from finclusters import ROOT
+from finclusters.instrumentation import count, timed
+from finclusters.price_history import PriceHistory
+
+# === Shared Market-Data Cache ===
+# Every page goes through get_info/get_price_history so one click hits Yahoo at most
+# once per ticker and field, no matter how many sessions ask concurrently.
+CACHE_PATH = Path(os.environ.get('FINCLUSTERS_MARKET_CACHE', ROOT / '.cache' / 'market_data.sqlite'))
+
+# Seconds each field stays fresh
+TTLS = {
+    'info': 15 * 60,
+    'prices': 60 * 60,
+}
+
+
+# === Backends ===
+class YFinanceBackend:
+    def info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+    def history(self, ticker, period=None, start=None):
+        import yfinance as yf
+        if start is not None:
+            return yf.Ticker(ticker).history(start=start)
+        return yf.Ticker(ticker).history(period=period)
+
+
+class FakeBackend:
+    # Deterministic offline data for tests, benchmarks and demos
+    PERIOD_DAYS = {'1mo': 21, '3mo': 63, '6mo': 126, '1y': 252, '2y': 504, '5y': 1260, 'max': 5040}
+
+    def __init__(self, infos=None, latency=0.0, failure_rate=0.0, seed=0):
+        self.infos = infos or {}
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = []
+
+    def _seed(self, ticker):
+        return int(hashlib.md5(ticker.encode()).hexdigest()[:8], 16)
+
+    def info(self, ticker):
+        self.calls.append(('info', ticker))
+        time.sleep(self.latency)
+        if self.rng.random() < self.failure_rate:
+            raise ConnectionError(f"simulated failure for {ticker}")
+        if ticker in self.infos:
+            return dict(self.infos[ticker])
+        if ticker == "^TNX":
+            return {"regularMarketPrice": 4.25}
+        rng = np.random.default_rng(self._seed(ticker))
+        price = float(rng.uniform(10, 400))
+        forward_pe = float(rng.uniform(8, 40))
+        return {
+            "longName": f"{ticker} Inc.",
+            "sector": "Technology",
+            "currentPrice": price,
+            "forwardPE": forward_pe,
+            "forwardEps": price / forward_pe,
+        }
+
+    def history(self, ticker, period=None, start=None):
+        self.calls.append(('history', ticker, period, start))
+        time.sleep(self.latency)
+        days = self.PERIOD_DAYS['max']
+        rng = np.random.default_rng(self._seed(ticker))
+        index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days)
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, days)))
+        hist = pd.DataFrame({"Close": close}, index=index)
+        if start is not None:
+            return hist[hist.index >= pd.Timestamp(start)]
+        return hist.iloc[-self.PERIOD_DAYS.get(period, 252):]
+
+
+_backend = None
+
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if os.environ.get('FINCLUSTERS_MARKET_BACKEND') == 'fake':
+            # FINCLUSTERS_FAKE_LATENCY (seconds per call) stands in for Yahoo round trips
+            _backend = FakeBackend(latency=float(os.environ.get('FINCLUSTERS_FAKE_LATENCY', '0')))
+        else:
+            _backend = YFinanceBackend()
+    return _backend
+
+
+# === SQLite Store ===
+_local = threading.local()
+
+
+def _connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS market_data ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+
+# Small in-process LRU in front of SQLite so hot keys skip unpickling
+MEMORY_ENTRIES = 256
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def _remember(key, value, fetched_at):
+    with _memory_lock:
+        _memory[key] = (value, fetched_at)
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _read(key, ttl=float('inf')):
+    with _memory_lock:
+        hit = _memory.get(key)
+    if hit is None or time.time() - hit[1] > ttl:
+        # Missing or expired in memory; another process may have refreshed SQLite
+        row = _connection().execute(
+            "SELECT value, fetched_at FROM market_data WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        hit = (pickle.loads(row[0]), row[1])
+        _remember(key, *hit)
+    if time.time() - hit[1] > ttl:
+        return None
+    return hit[0]
+
+
+def _write(key, value):
+    fetched_at = time.time()
+    conn = _connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO market_data (key, value, fetched_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), fetched_at),
+        )
+    _remember(key, value, fetched_at)
+
+
+def clear_cache():
+    conn = _connection()
+    with conn:
+        conn.execute("DELETE FROM market_data")
+    with _memory_lock:
+        _memory.clear()
+
+
+# === Request Coalescing ===
+# Sessions run as threads of one process; the first caller for a key fetches
+# and everyone else waiting on the same key reuses its result.
+_inflight_lock = threading.Lock()
+_inflight = {}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def _cached_fetch(key, ttl, fetch, refresh=None):
+    # `refresh(stale)` updates an expired value instead of fetching it from scratch
+    kind = key.split(':', 1)[0]
+    value = _read(key, ttl)
+    if value is not None:
+        count('market_cache_hits', kind)
+        return value
+
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        count('market_cache_coalesced', kind)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    try:
+        # Another process may have filled the key while we waited for the lock
+        value = _read(key, ttl)
+        if value is None:
+            count('market_cache_misses', kind)
+            stale = _read(key) if refresh is not None else None
+            value = refresh(stale) if stale is not None else fetch()
+            _write(key, value)
+        call.value = value
+        return value
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        call.done.set()
+
+
+def get_info(ticker, limiter=None):
+    # `limiter` throttles the backend call only; cache hits are never delayed
+    ticker = ticker.upper()
+
+    def fetch():
+        if limiter is not None:
+            limiter.acquire()
+        count('network_calls', 'yfinance: info')
+        with timed('yfinance: info'):
+            return get_backend().info(ticker)
+
+    return _cached_fetch(f"info:{ticker}", TTLS['info'], fetch)
+
+
+def peek_infos(tickers):
+    # Whatever info is already cached (fresh or stale) for these tickers; never hits the network
+    wanted = {f"info:{t.upper()}" for t in tickers}
+    rows = _connection().execute("SELECT key, value FROM market_data WHERE key LIKE 'info:%'").fetchall()
+    return {key[len("info:"):]: pickle.loads(value) for key, value in rows if key in wanted}
+
+
+# === Bulk Fetch ===
+class RateLimiter:
+    # Token bucket shared by all worker threads: `rate` calls/second, bursts up to `burst`
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+def _info_with_retries(ticker, limiter, retries, backoff, deadline):
+    for attempt in range(retries + 1):
+        try:
+            return get_info(ticker, limiter=limiter)
+        except Exception:
+            delay = backoff * 2 ** attempt * (0.5 + random.random())
+            if attempt == retries or time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+
+
+def fetch_infos(tickers, fields=None, max_workers=8, rate=10.0, retries=2, backoff=0.25, budget=15.0):
+    # Fetches info for many tickers concurrently within `budget` seconds.
+    # Returns (results, failures): ticker -> {field: value} for successes and
+    # ticker -> error message for tickers that failed or ran out of time.
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    limiter = RateLimiter(rate) if rate else None
+    deadline = time.monotonic() + budget
+    results, failures = {}, {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='finclusters-fetch')
+    futures = {
+        executor.submit(_info_with_retries, t, limiter, retries, backoff, deadline): t
+        for t in tickers
+    }
+    done, pending = wait(futures, timeout=budget)
+    # Don't block the page on stragglers; queued work is dropped
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for future in done:
+        ticker = futures[future]
+        try:
+            info = future.result()
+        except Exception as e:
+            failures[ticker] = str(e) or type(e).__name__
+            continue
+        results[ticker] = {f: info.get(f) for f in fields} if fields else info
+    for future in pending:
+        failures[futures[future]] = "timed out"
+    return results, failures
+
+
+# === Price History ===
+# The full history is downloaded once per ticker; later refreshes only pull
+# bars from the last stored date onward and splice them in.
+def _fetch_prices(ticker):
+    count('network_calls', 'yfinance: history')
+    with timed('yfinance: history'):
+        return PriceHistory.from_frame(get_backend().history(ticker, period="max"))
+
+
+def _refresh_prices(ticker, stale):
+    if not len(stale):
+        return _fetch_prices(ticker)
+    count('network_calls', 'yfinance: history')
+    with timed('yfinance: history'):
+        newer = PriceHistory.from_frame(get_backend().history(ticker, start=stale.last_date.date()))
+    return stale.merge(newer)
+
+
+def get_price_history(ticker):
+    ticker = ticker.upper()
+    return _cached_fetch(
+        f"prices:{ticker}", TTLS['prices'],
+        lambda: _fetch_prices(ticker),
+        refresh=lambda stale: _refresh_prices(ticker, stale),
+    )
@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+
+import numpy as np
+import streamlit as st
+
+from finclusters.data_sources import table_version
+from finclusters.instrumentation import track_cache
+from finclusters.registry import MAX_LOADED_SECTORS
+from finclusters.sectors import data_version, load_active_tickers, load_models_and_data
+
+
+# === Closest Peers ===
+# One KD-tree per cluster over every active ticker-year in the standardized
+# feature space; a query ranks tickers by their nearest year.
+@dataclass(frozen=True)
+class NeighborIndex:
+    features: list
+    mean: np.ndarray
+    scale: np.ndarray
+    trees: dict          # cluster -> KDTree over that cluster's rows
+    row_tickers: dict    # cluster -> (rows,) ticker per tree row
+    row_years: dict      # cluster -> (rows,) fiscal year per tree row
+
+    def standardize(self, X):
+        return (np.asarray(X, dtype=float) - self.mean) / self.scale
+
+    def closest(self, cluster_id, point, n, exclude=()):
+        # Returns [(ticker, distance, fyear)] for the n nearest distinct tickers
+        tree = self.trees.get(cluster_id)
+        if tree is None:
+            return []
+        tickers = self.row_tickers[cluster_id]
+        years = self.row_years[cluster_id]
+        z = self.standardize(point)[None, :]
+        total = len(tickers)
+        k = min(total, max(4 * n, n + 8))
+        while True:
+            dist, idx = tree.query(z, k=k)
+            ranked = []
+            seen = set(exclude)
+            for d, i in zip(dist[0], idx[0]):
+                t = tickers[i]
+                if t not in seen:
+                    seen.add(t)
+                    ranked.append((t, float(d), int(years[i])))
+                    if len(ranked) == n:
+                        return ranked
+            if k == total:
+                return ranked
+            k = min(total, k * 2)
+
+
+def _scaler_stats(scaler, features):
+    # The scaler may be fit on more columns than the data store carries
+    # (GICS 45 lacks SGA_Sales), so pick the matching statistics by name.
+    names = list(getattr(scaler, 'feature_names_in_', features))
+    idx = [names.index(f) for f in features]
+    mean = scaler.mean_[idx] if scaler.with_mean else np.zeros(len(idx))
+    scale = scaler.scale_[idx] if scaler.with_std else np.ones(len(idx))
+    return mean, scale
+
+
+def build_neighbor_index(df, scaler, features, active_tickers):
+    from sklearn.neighbors import KDTree
+
+    features = [f for f in features if f in df.columns]
+    mean, scale = _scaler_stats(scaler, features)
+
+    tickers = df['tic'].astype(str).str.upper().to_numpy()
+    X = df[features].to_numpy(dtype=float)
+    keep = np.isin(tickers, list(active_tickers)) & ~np.isnan(X).any(axis=1)
+    clusters = df['cluster'].to_numpy().astype(int)
+
+    trees, row_tickers, row_years = {}, {}, {}
+    fyears = df['fyear'].to_numpy()
+    Z = (X - mean) / scale
+    for cluster_id in np.unique(clusters[keep]):
+        rows = keep & (clusters == cluster_id)
+        trees[int(cluster_id)] = KDTree(Z[rows])
+        row_tickers[int(cluster_id)] = tickers[rows]
+        row_years[int(cluster_id)] = fyears[rows]
+    return NeighborIndex(features, mean, scale, trees, row_tickers, row_years)
+
+
+@track_cache(st.cache_resource(max_entries=MAX_LOADED_SECTORS))
+def _neighbor_index(sector_key, version, active_version):
+    scaler, _, _, df, features = load_models_and_data(sector_key, version)
+    return build_neighbor_index(df, scaler, features, load_active_tickers())
+
+
+def load_neighbor_index(sector_key, version=None):
+    # Rebuilt only when the sector data or the active-company list changes
+    version = data_version(sector_key) if version is None else version
+    return _neighbor_index(sector_key, version, table_version('active_companies'))
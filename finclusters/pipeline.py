@@ -0,0 +1,221 @@
+import argparse
+import copy
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from finclusters.ratios import RAW_FIELDS, SECTOR_COLUMNS, VOLATILITIES, add_volatilities, compute_ratios, winsorize
+from finclusters.registry import REGISTRY, manifest, rehash
+from finclusters.scoring import SectorScorer, score_frame
+from finclusters.sectors import read_models, sector_path
+from finclusters.store import append_store, read_sector_frame, read_store
+
+# === Incremental Re-clustering ===
+# Ingests a new fiscal year of Compustat-style rows (columns as in
+# clustered_data_hc.csv). Ratios and rolling volatilities are computed only for
+# the companies in the new rows, from their stored history; the scored rows are
+# appended to the sector CSV and store. Existing rows keep their clusters.
+SCORE_COLUMNS = ['cluster', 'pca_1', 'pca_2']
+
+
+@dataclass
+class IngestResult:
+    sector: str
+    rows: pd.DataFrame      # scored rows as appended (or as they would be, for a dry run)
+    skipped_existing: int   # (gvkey, fyear) already in the sector data
+    unscored: int           # rows missing a feature, e.g. fewer than 3 years for the volatilities
+    model_updated: bool
+
+
+def split_by_sector(df):
+    column = next((c for c in SECTOR_COLUMNS if c in df.columns), None)
+    if column is None:
+        raise ValueError(f"new rows need a sector column ({' or '.join(SECTOR_COLUMNS)}) or --sector")
+    codes = pd.to_numeric(df[column], errors='coerce')
+    return {f"GICS_{int(code)}": group for code, group in df.groupby(codes)}
+
+
+def read_history(sector_key):
+    # CSV header plus the columns needed for duplicates, bounds, cluster sizes and volatilities
+    path = sector_path(sector_key, 'data')
+    header = list(pd.read_csv(path, nrows=0).columns)
+    wanted = {'gvkey', 'fyear', 'cluster', *manifest(sector_key).features, *RAW_FIELDS}
+    return header, pd.read_csv(path, usecols=[c for c in header if c in wanted])
+
+
+def stored_bounds(history, features):
+    # Stored ratios were winsorized when the models were trained, so their range is the clip range
+    return {
+        f: (history[f].min(), history[f].max())
+        for f in features if f in history.columns and history[f].notna().any()
+    }
+
+
+def complete_rows(df, features):
+    # Rows with every stored feature present: what the neighbour index and k selection can use
+    return int(df[[f for f in features if f in df.columns]].notna().all(axis=1).sum())
+
+
+def _volatility_inputs(history, gvkeys):
+    # Raw ROA/ROE where the CSV still carries Compustat fields, else the stored ratios
+    past = history[history['gvkey'].isin(gvkeys)]
+    raw = compute_ratios(past)
+    columns = {'gvkey': past['gvkey'], 'fyear': past['fyear']}
+    for base in VOLATILITIES.values():
+        stored = past[base] if base in past.columns else np.nan
+        columns[base] = raw[base].fillna(stored) if base in raw.columns else stored
+    return pd.DataFrame(columns)
+
+
+def prepare_rows(sector_key, new_rows, history):
+    features = manifest(sector_key).features
+    rows = new_rows.reset_index(drop=True).copy()
+    for name, values in compute_ratios(rows).items():
+        rows[name] = values
+
+    bases = list(VOLATILITIES.values())
+    missing = [b for b in bases if b not in rows.columns]
+    if missing:
+        raise ValueError(f"new rows need the fields for {', '.join(missing)}")
+    past = _volatility_inputs(history, rows['gvkey'].unique()).assign(_row=-1)
+    current = rows[['gvkey', 'fyear', *bases]].assign(_row=np.arange(len(rows)))
+    combined = add_volatilities(pd.concat([past, current], ignore_index=True))
+    vols = combined[combined['_row'] >= 0].set_index('_row')[list(VOLATILITIES)]
+    for vol in VOLATILITIES:
+        rows[vol] = vols[vol].reindex(np.arange(len(rows))).to_numpy()
+
+    return winsorize(rows, stored_bounds(history, features))
+
+
+def update_centers(centers, counts, Z, labels):
+    # One mini-batch k-means step: each centre moves to the running mean of its
+    # historical members and the new rows assigned to it (learning rate 1/count)
+    k = len(centers)
+    sums = np.zeros_like(centers)
+    np.add.at(sums, labels, Z)
+    added = np.bincount(labels, minlength=k)
+    total = counts + added
+    moved = (centers * counts[:, None] + sums) / np.maximum(total, 1)[:, None]
+    return np.where(added[:, None] > 0, moved, centers)
+
+
+def _save_model(sector_key, model, path):
+    import joblib
+
+    tmp = path.with_suffix('.tmp')
+    joblib.dump(model, tmp)
+    os.replace(tmp, path)
+    rehash(sector_key, ['kmeans'])
+
+
+def _append_rows(sector_key, header, rows):
+    # Only the existing header's columns are written: a feature the CSV never stored
+    # (e.g. SGA_Sales for GICS_45) is used for scoring but kept out of the CSV and store,
+    # since adding it would leave every earlier row incomplete
+    missing = [c for c in SCORE_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"{sector_path(sector_key, 'data').name} has no {', '.join(missing)} column")
+    path = sector_path(sector_key, 'data')
+    previous = read_store(sector_key)
+    rows = rows.reindex(columns=header)
+    with open(path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
+    rows.to_csv(path, mode='a', header=False, index=False)
+    rehash(sector_key, ['data'])
+    append_store(sector_key, previous, rows)
+
+
+def ingest(sector_key, new_rows, update_model=False, dry_run=False):
+    features = manifest(sector_key).features
+    header, history = read_history(sector_key)
+
+    new_rows = new_rows.reset_index(drop=True)
+    known = pd.MultiIndex.from_frame(history[['gvkey', 'fyear']])
+    existing = pd.MultiIndex.from_frame(new_rows[['gvkey', 'fyear']]).isin(known)
+    rows = prepare_rows(sector_key, new_rows[~existing], history)
+
+    missing = [f for f in features if f not in rows.columns]
+    if missing:
+        raise ValueError(f"{sector_key} needs fields for: {', '.join(missing)}")
+    complete = rows[features].notna().all(axis=1).to_numpy()
+    rows = rows[complete].drop(columns=[c for c in SCORE_COLUMNS if c in rows.columns])
+
+    scaler, kmeans, pca = read_models(sector_key)
+    model_updated = False
+    if update_model and len(rows):
+        scorer = SectorScorer.from_models(features, scaler, kmeans, pca)
+        X = rows[features].to_numpy(dtype=float)
+        labels, _ = scorer.score(X)
+        counts = np.bincount(history['cluster'].to_numpy(dtype=int), minlength=len(scorer.centers))
+        kmeans = copy.deepcopy(kmeans)
+        kmeans.cluster_centers_ = update_centers(scorer.centers, counts, (X - scorer.mean) / scorer.scale, labels)
+        model_updated = True
+
+    scores = score_frame(sector_key, rows, scorer=SectorScorer.from_models(features, scaler, kmeans, pca))
+    rows = rows.join(scores)
+
+    for column in SECTOR_COLUMNS:
+        if column in header and column not in rows.columns:
+            rows[column] = int(sector_key.split('_')[1])
+
+    if not dry_run and len(rows):
+        if model_updated:
+            _save_model(sector_key, kmeans, sector_path(sector_key, 'kmeans'))
+        before = complete_rows(history, features)
+        _append_rows(sector_key, header, rows)
+        after = complete_rows(read_sector_frame(sector_key), features)
+        if after < before + len(rows):
+            raise ValueError(f"complete feature rows went from {before} to {after} after appending {len(rows)}")
+    return IngestResult(sector_key, rows, int(existing.sum()), int((~complete).sum()), model_updated and not dry_run)
+
+
+# === CLI ===
+# python -m finclusters.pipeline compustat_2024.csv                  every sector in the file
+# python -m finclusters.pipeline new.csv --sector GICS_35 --update-model
+# python -m finclusters.pipeline new.csv --dry-run -o preview.csv
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append a new fiscal year of Compustat rows to the clustered sector data.")
+    parser.add_argument('input', help="CSV with Compustat annual fields (gvkey, fyear, tic, ni, at, ceq, ...)")
+    parser.add_argument('--sector', choices=sorted(REGISTRY), help="Sector of every row (default: from the GIC Sectors column)")
+    parser.add_argument('--update-model', action='store_true', help="Move the KMeans centres with a mini-batch step before assigning")
+    parser.add_argument('--dry-run', action='store_true', help="Score the rows without touching the data, store or models")
+    parser.add_argument('-o', '--output', help="Also write the scored rows to this CSV")
+    args = parser.parse_args(argv)
+
+    new_rows = pd.read_csv(args.input)
+    try:
+        groups = {args.sector: new_rows} if args.sector else split_by_sector(new_rows)
+    except ValueError as e:
+        parser.error(str(e))
+
+    failed = False
+    scored = []
+    for sector_key, group in groups.items():
+        if sector_key not in REGISTRY:
+            print(f"{sector_key}: no model, skipped {len(group)} rows", file=sys.stderr)
+            continue
+        try:
+            result = ingest(sector_key, group, update_model=args.update_model, dry_run=args.dry_run)
+        except ValueError as e:
+            print(f"{sector_key}: {e}", file=sys.stderr)
+            failed = True
+            continue
+        verb = "would append" if args.dry_run else "appended"
+        print(
+            f"{sector_key}: {verb} {len(result.rows)} rows, {result.skipped_existing} already present, "
+            f"{result.unscored} missing features" + (", model updated" if result.model_updated else "")
+        )
+        scored.append(result.rows.assign(sector=sector_key))
+
+    if args.output and scored:
+        pd.concat(scored, ignore_index=True).to_csv(args.output, index=False)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
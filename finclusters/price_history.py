@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# === Price Forecast Time Frames ===
+# Lookback from the latest bar; None means the full history
+TIMEFRAMES = {
+    "1M": pd.DateOffset(months=1),
+    "3M": pd.DateOffset(months=3),
+    "6M": pd.DateOffset(months=6),
+    "1Y": pd.DateOffset(years=1),
+    "2Y": pd.DateOffset(years=2),
+    "5Y": pd.DateOffset(years=5),
+    "Max": None,
+}
+
+
+class PriceHistory:
+    # Compact columnar close history: datetime64[ns] dates + float32 closes.
+    # Every time frame is served as a view into these two arrays.
+    __slots__ = ('dates', 'close')
+
+    def __init__(self, dates, close):
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.close = np.asarray(close, dtype=np.float32)
+
+    @classmethod
+    def from_frame(cls, hist):
+        if hist.empty:
+            return cls(np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.float32))
+        index = pd.DatetimeIndex(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        return cls(index.to_numpy(dtype='datetime64[ns]'), hist["Close"].to_numpy(dtype=np.float32))
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def last_date(self):
+        return pd.Timestamp(self.dates[-1]) if len(self) else None
+
+    def slice(self, timeframe):
+        offset = TIMEFRAMES[timeframe]
+        if offset is None or not len(self):
+            return self.dates, self.close
+        start = np.datetime64(self.last_date - offset, 'ns')
+        i = np.searchsorted(self.dates, start, side='left')
+        return self.dates[i:], self.close[i:]
+
+    def series(self, timeframe):
+        dates, close = self.slice(timeframe)
+        return pd.Series(close, index=pd.DatetimeIndex(dates), name="Close", copy=False)
+
+    def merge(self, newer):
+        # Bars from `newer` replace any overlap (e.g. the previous partial session bar)
+        if not len(newer):
+            return self
+        keep = np.searchsorted(self.dates, newer.dates[0], side='left')
+        return PriceHistory(
+            np.concatenate([self.dates[:keep], newer.dates]),
+            np.concatenate([self.close[:keep], newer.close]),
+        )
@@ -0,0 +1,207 @@
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# === Financial Ratios ===
+# Formulas from the Methodology page, from raw Compustat annual fields:
+# ratio -> (numerator, denominator)
+RATIOS = {
+    'ROA': ('ni', 'at'),
+    'ROE': ('ni', 'ceq'),
+    'RD_Sales': ('xrd', 'sale'),
+    'SGA_Sales': ('xsga', 'sale'),
+    'CapEx_Sales': ('capx', 'sale'),
+    'Debt_Assets': ('lt', 'at'),
+    'Market_Book': ('mkvalt', 'ceq'),
+    'WC_TA': ('wcap', 'at'),
+    'RE_TA': ('re', 'at'),
+}
+RAW_FIELDS = sorted({field for pair in RATIOS.values() for field in pair})
+
+# 3-year rolling standard deviations of the unwinsorized ratios
+VOL_WINDOW = 3
+VOLATILITIES = {'ROA_vol': 'ROA', 'ROE_vol': 'ROE'}
+FEATURES = list(RATIOS) + list(VOLATILITIES)
+
+# Identifying columns carried through to the feature output
+SECTOR_COLUMNS = ('GIC Sectors', 'gsector')
+ID_COLUMNS = ('gvkey', 'tic', 'fyear', *SECTOR_COLUMNS)
+
+WINSOR_LIMITS = (0.01, 0.99)
+CHUNK_SIZE = 250_000
+
+
+def compute_ratios(df):
+    # Every ratio whose inputs are present; division by zero gives NaN
+    ratios = pd.DataFrame(index=df.index)
+    for name, (numerator, denominator) in RATIOS.items():
+        if numerator in df.columns and denominator in df.columns:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = df[numerator].to_numpy(dtype=float) / df[denominator].to_numpy(dtype=float)
+            ratios[name] = np.where(np.isfinite(values), values, np.nan)
+    return ratios
+
+
+def rolling_std(values, groups, window=VOL_WINDOW):
+    # Sample std over each row and the window-1 rows before it in the same group.
+    # Rows must be sorted by (group, fyear); NaN until the window is full or if it holds a NaN.
+    n = len(values)
+    lags = np.full((window, n), np.nan)
+    lags[0] = values
+    for lag in range(1, window):
+        same = groups[lag:] == groups[:-lag]
+        lags[lag, lag:] = np.where(same, values[:-lag], np.nan)
+    return lags.std(axis=0, ddof=1)
+
+
+def add_volatilities(df, window=VOL_WINDOW):
+    # Rolling volatilities over each gvkey's last `window` fiscal years
+    df = df.sort_values(['gvkey', 'fyear'], kind='stable')
+    gvkeys = df['gvkey'].to_numpy()
+    for vol, base in VOLATILITIES.items():
+        df[vol] = rolling_std(df[base].to_numpy(dtype=float), gvkeys, window)
+    return df
+
+
+def engineer(df, window=VOL_WINDOW):
+    # Identifiers, ratios and volatilities (not yet winsorized), sorted by gvkey and fyear
+    df = df.sort_values(['gvkey', 'fyear'], kind='stable')
+    features = df[[c for c in ID_COLUMNS if c in df.columns]].join(compute_ratios(df))
+    if all(base in features.columns for base in VOLATILITIES.values()):
+        features = add_volatilities(features, window)
+    return features.reset_index(drop=True)
+
+
+def iter_features(chunks, window=VOL_WINDOW):
+    # Engineers a stream of DataFrame chunks sorted by gvkey. The last company of
+    # each chunk is held back and prepended to the next one, so memory stays at
+    # one chunk plus one company's history however long the extract is.
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        gvkeys = chunk['gvkey'].to_numpy()
+        if len(gvkeys) and (np.diff(gvkeys) < 0).any():
+            raise ValueError("input rows must be sorted by gvkey")
+        tail = gvkeys == gvkeys[-1] if len(gvkeys) else np.zeros(0, dtype=bool)
+        carry = chunk[tail]
+        if (~tail).any():
+            yield engineer(chunk[~tail], window)
+    if carry is not None and len(carry):
+        yield engineer(carry, window)
+
+
+# === Winsorization ===
+def winsor_bounds(df, columns=FEATURES, limits=WINSOR_LIMITS):
+    # column -> (low, high) quantiles, ignoring NaN
+    bounds = {}
+    for col in columns:
+        if col in df.columns:
+            values = df[col].to_numpy(dtype=float)
+            if not np.isnan(values).all():
+                low, high = np.nanquantile(values, limits)
+                bounds[col] = (float(low), float(high))
+    return bounds
+
+
+def winsorize(df, bounds):
+    # bounds: column -> (low, high); columns without bounds are left alone
+    df = df.copy()
+    for col, (low, high) in bounds.items():
+        if col in df.columns:
+            df[col] = df[col].clip(low, high)
+    return df
+
+
+def winsorize_groups(df, bounds, by=None):
+    # bounds: group -> {column: (low, high)}, with group None when not split by sector
+    if by is None or by not in df.columns:
+        return winsorize(df, bounds.get(None, {}))
+    parts = [winsorize(part, bounds.get(group, {})) for group, part in df.groupby(by, sort=False)]
+    return pd.concat(parts).sort_index() if parts else df
+
+
+# === Chunked Build ===
+def build_features(source, destination, chunksize=CHUNK_SIZE, limits=WINSOR_LIMITS, by=None, window=VOL_WINDOW):
+    # Two passes in bounded memory: engineer chunk by chunk into a temporary Arrow
+    # file, take winsorization quantiles one column at a time from the memory-mapped
+    # file, then clip batch by batch into `destination` (.feather/.arrow or CSV).
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    header = pd.read_csv(source, nrows=0).columns
+    usecols = [c for c in header if c in ID_COLUMNS or c in RAW_FIELDS]
+    by = by if by in header else None
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        staged = Path(tmpdir) / 'features.arrow'
+        writer, schema, rows = None, None, 0
+        for frame in iter_features(pd.read_csv(source, usecols=usecols, chunksize=chunksize), window):
+            if writer is None:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                schema = table.schema
+                writer = ipc.new_file(staged, schema)
+            else:
+                table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+            writer.write_table(table)
+            rows += len(frame)
+        if writer is None:
+            raise ValueError(f"{source} has no rows")
+        writer.close()
+
+        with pa.memory_map(str(staged)) as mapped:
+            reader = ipc.open_file(mapped)
+            table = reader.read_all()
+            groups = table.column(by).to_numpy(zero_copy_only=False) if by else None
+            bounds = {}
+            for col in FEATURES:
+                if col not in table.column_names:
+                    continue
+                values = pd.DataFrame({col: table.column(col).to_numpy(zero_copy_only=False)})
+                if groups is None:
+                    bounds.setdefault(None, {}).update(winsor_bounds(values, [col], limits))
+                else:
+                    for group, part in values.groupby(groups, sort=False):
+                        bounds.setdefault(group, {}).update(winsor_bounds(part, [col], limits))
+            del table
+
+            destination = Path(destination)
+            columnar = destination.suffix in ('.feather', '.arrow')
+            out = ipc.new_file(destination, schema) if columnar else None
+            for i in range(reader.num_record_batches):
+                frame = winsorize_groups(reader.get_batch(i).to_pandas(), bounds, by)
+                if columnar:
+                    out.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+                else:
+                    frame.to_csv(destination, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            if out is not None:
+                out.close()
+    return rows, bounds
+
+
+# === CLI ===
+# python -m finclusters.ratios compustat_extract.csv -o features.feather --by "GIC Sectors"
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Derive winsorized financial ratios and rolling volatilities from Compustat fields.")
+    parser.add_argument('input', help="Compustat annual CSV sorted by gvkey (gvkey, fyear, tic, ni, at, ceq, ...)")
+    parser.add_argument('-o', '--output', required=True, help="Output .feather/.arrow or .csv")
+    parser.add_argument('--by', help="Winsorize within groups of this column, e.g. 'GIC Sectors'")
+    parser.add_argument('--limits', type=float, nargs=2, default=list(WINSOR_LIMITS), metavar=('LOW', 'HIGH'))
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    try:
+        rows, bounds = build_features(args.input, args.output, args.chunk_size, tuple(args.limits), args.by)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"wrote {rows} rows -> {args.output} ({len(bounds)} winsorization group(s))")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
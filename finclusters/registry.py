@@ -0,0 +1,185 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+from finclusters import ROOT
+
+# === Sector Model Registry ===
+# One directory per GICS sector under models/, each with a manifest.json:
+#   {"sector": "GICS_35", "name": "Health Care", "features": [...],
+#    "files": {"scaler": ..., "kmeans": ..., "pca": ..., "data": ..., "store": ...},
+#    "sha256": {"scaler": ..., "kmeans": ..., "pca": ..., "data": ...}}
+# Manifests are discovered once at import; the artifacts themselves are only
+# read when a sector is first used. Adding a sector is adding a directory.
+MODELS_DIR = Path(os.environ.get('FINCLUSTERS_MODELS_DIR', ROOT / 'models'))
+MANIFEST = 'manifest.json'
+MODEL_FILES = ('scaler', 'kmeans', 'pca')
+# Checksummed artifacts; the store is derived from the CSV and records its own source hash
+HASHED_FILES = MODEL_FILES + ('data',)
+
+# Sectors whose loaded bundle and derived indexes stay in memory per process;
+# the least recently used sector is dropped beyond this
+MAX_LOADED_SECTORS = int(os.environ.get('FINCLUSTERS_MAX_SECTORS', '4'))
+
+
+@dataclass(frozen=True)
+class SectorManifest:
+    key: str
+    name: str
+    directory: Path
+    features: list
+    files: dict      # kind -> file name inside directory
+    sha256: dict     # kind -> hex digest recorded when the artifact was registered
+
+    def path(self, kind):
+        return self.directory / self.files[kind]
+
+
+def file_sha256(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def read_manifest(directory):
+    raw = json.loads((directory / MANIFEST).read_text())
+    return SectorManifest(
+        key=raw['sector'],
+        name=raw.get('name', raw['sector']),
+        directory=directory,
+        features=list(raw['features']),
+        files=dict(raw['files']),
+        sha256=dict(raw.get('sha256', {})),
+    )
+
+
+def write_manifest(manifest):
+    raw = {
+        'sector': manifest.key,
+        'name': manifest.name,
+        'features': manifest.features,
+        'files': manifest.files,
+        'sha256': manifest.sha256,
+    }
+    tmp = manifest.directory / (MANIFEST + '.tmp')
+    tmp.write_text(json.dumps(raw, indent=2) + "\n")
+    os.replace(tmp, manifest.directory / MANIFEST)
+
+
+def discover(models_dir=MODELS_DIR):
+    # sector key -> manifest, in directory-name order
+    registry = {}
+    for path in sorted(models_dir.glob(f'*/{MANIFEST}')):
+        manifest = read_manifest(path.parent)
+        registry[manifest.key] = manifest
+    return registry
+
+
+REGISTRY = discover()
+
+
+def manifest(sector_key):
+    return REGISTRY[sector_key]
+
+
+def verify(sector_key, kinds=HASHED_FILES):
+    # Kinds whose file no longer matches the recorded checksum (missing files included)
+    m = REGISTRY[sector_key]
+    stale = []
+    for kind in kinds:
+        path = m.path(kind)
+        if not path.exists() or m.sha256.get(kind) != file_sha256(path):
+            stale.append(kind)
+    return stale
+
+
+def check_models(sector_key):
+    # Pickles are only unpickled if they are the ones the manifest was written for
+    stale = verify(sector_key, MODEL_FILES)
+    if stale:
+        names = ', '.join(manifest(sector_key).files[k] for k in stale)
+        raise ValueError(
+            f"{sector_key}: {names} do not match {MANIFEST}; if they were retrained on purpose, "
+            f"run `python -m finclusters.registry rehash {sector_key}`"
+        )
+
+
+def rehash(sector_key, kinds=HASHED_FILES):
+    # Record the current checksums, e.g. after retraining or appending a fiscal year
+    m = REGISTRY[sector_key]
+    sha256 = {**m.sha256, **{kind: file_sha256(m.path(kind)) for kind in kinds}}
+    updated = SectorManifest(m.key, m.name, m.directory, m.features, m.files, sha256)
+    write_manifest(updated)
+    REGISTRY[sector_key] = updated
+    return updated
+
+
+def add_sector(sector_key, name, features, sources, models_dir=MODELS_DIR):
+    # Copies the artifacts into models/<sector_key>/ and writes its manifest
+    directory = models_dir / sector_key
+    directory.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for kind, source in sources.items():
+        source = Path(source)
+        shutil.copy2(source, directory / source.name)
+        files[kind] = source.name
+    files.setdefault('store', Path(files['data']).with_suffix('.feather').name)
+    sha256 = {kind: file_sha256(directory / files[kind]) for kind in HASHED_FILES}
+    m = SectorManifest(sector_key, name, directory, list(features), files, sha256)
+    write_manifest(m)
+    REGISTRY[sector_key] = m
+    return m
+
+
+# === CLI ===
+# python -m finclusters.registry                    list sectors and check checksums
+# python -m finclusters.registry rehash GICS_35     accept retrained/updated artifacts
+# python -m finclusters.registry add GICS_20 --name Industrials --features ROA ROE ... \
+#     --scaler scaler_ind.pkl --kmeans kmeans_ind.pkl --pca pca_ind.pkl --data clustered_data_ind.csv
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List, verify and register sector model bundles under models/.")
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('list', help="List registered sectors and flag artifacts that changed since registration")
+    rehash_parser = commands.add_parser('rehash', help="Record the current checksums of a sector's artifacts")
+    rehash_parser.add_argument('sectors', nargs='*', help="Sectors to rehash (default: all)")
+    add_parser = commands.add_parser('add', help="Register a new sector from trained artifacts")
+    add_parser.add_argument('sector', help="Sector key, e.g. GICS_20")
+    add_parser.add_argument('--name', required=True, help="Display name, e.g. Industrials")
+    add_parser.add_argument('--features', nargs='+', required=True, help="Feature columns in the order the scaler was fit on")
+    for kind in MODEL_FILES + ('data',):
+        add_parser.add_argument(f'--{kind}', required=True, help=f"{kind} file to copy into models/<sector>/")
+    args = parser.parse_args(argv)
+
+    if args.command == 'add':
+        if args.sector in REGISTRY:
+            parser.error(f"{args.sector} is already registered in {REGISTRY[args.sector].directory}")
+        m = add_sector(args.sector, args.name, args.features, {k: getattr(args, k) for k in MODEL_FILES + ('data',)})
+        print(f"{m.key}: registered in {m.directory}; run `python -m finclusters.store {m.key}` to build its store")
+        return 0
+
+    if args.command == 'rehash':
+        unknown = [s for s in args.sectors if s not in REGISTRY]
+        if unknown:
+            parser.error(f"unknown sector(s): {', '.join(unknown)}")
+        for sector_key in args.sectors or list(REGISTRY):
+            rehash(sector_key)
+            print(f"{sector_key}: checksums updated")
+        return 0
+
+    if not REGISTRY:
+        print(f"no sector manifests under {MODELS_DIR}", file=sys.stderr)
+        return 1
+    failed = False
+    for sector_key, m in REGISTRY.items():
+        stale = verify(sector_key)
+        status = "ok" if not stale else f"changed: {', '.join(m.files[k] for k in stale)}"
+        print(f"{sector_key:<9}{m.name:<26}{len(m.features):>3} features  {m.directory.relative_to(MODELS_DIR.parent)}  {status}")
+        failed |= bool(stale)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from finclusters import ROOT
+from finclusters.data_sources import load_table, table_version
+from finclusters.instrumentation import track_cache
+
+# === Factor Models ===
+# Factor order is fixed: market, SMB, HML, MOM. Each model uses a prefix of it.
+MODELS = ("CAPM", "FF3", "Carhart")
+MODEL_FACTORS = {"CAPM": 1, "FF3": 3, "Carhart": 4}
+N_FACTORS = 4
+
+# Default factor inputs
+FACTOR_PREMIA = {
+    "CAPM": [0.01],
+    "FF3": [0.01, 0.02, -0.01],
+    "Carhart": [0.01, 0.02, -0.01, 0.015]
+}
+
+# Forward-looking market premium (NYU Stern)
+FORWARD_MARKET_PREMIUM = 0.0442
+
+
+@dataclass(frozen=True)
+class CoefficientMatrix:
+    tickers: np.ndarray      # (n,) upper-case tickers
+    row: dict                # ticker -> row in the arrays below
+    sector: np.ndarray       # (n,) GICS sector key
+    model: np.ndarray        # (n,) model name as in the CSV
+    model_code: np.ndarray   # (n,) index into MODELS, -1 for unknown models
+    coefs: np.ndarray        # (n, 5) intercept, coef_1..coef_4 with missing coefs as 0
+    valid: np.ndarray        # (n,) coefficient count matches the model's factor count
+
+    def __contains__(self, ticker):
+        return ticker in self.row
+
+    def rows(self, tickers):
+        # Row indices for the tickers present in the table (unknown tickers are skipped)
+        return np.array([self.row[t] for t in tickers if t in self.row], dtype=np.intp)
+
+
+def build_coefficient_matrix(coeff_df):
+    tickers = coeff_df["ticker"].astype(str).str.upper().to_numpy()
+    model = coeff_df["model"].astype(str).to_numpy()
+    model_code = np.full(len(coeff_df), -1, dtype=np.int8)
+    for code, name in enumerate(MODELS):
+        model_code[model == name] = code
+
+    coef_cols = [f"coef_{i}" for i in range(1, N_FACTORS + 1)]
+    raw = np.column_stack([
+        coeff_df[col].to_numpy(dtype=float) if col in coeff_df.columns else np.full(len(coeff_df), np.nan)
+        for col in coef_cols
+    ])
+    present = ~np.isnan(raw)
+    expected = np.array([MODEL_FACTORS.get(m, -1) for m in MODELS])[model_code]
+
+    # A row is usable when exactly the model's leading coefficients are present
+    valid = (model_code >= 0) & (present.sum(axis=1) == expected)
+    valid &= present[np.arange(len(raw)), np.clip(expected - 1, 0, N_FACTORS - 1)]
+
+    coefs = np.column_stack([coeff_df["intercept"].to_numpy(dtype=float), np.nan_to_num(raw)])
+    # Keep the first row per ticker, matching the old `.iloc[0]` lookups
+    row = {}
+    for i, t in enumerate(tickers.tolist()):
+        row.setdefault(t, i)
+    sector = coeff_df["sector"].astype(str).to_numpy() if "sector" in coeff_df.columns else np.full(len(coeff_df), "Unknown")
+    return CoefficientMatrix(tickers, row, sector, model, model_code, coefs, valid)
+
+
+@track_cache(st.cache_resource)
+def _coefficient_matrix(version):
+    return build_coefficient_matrix(load_table('coefficients'))
+
+
+def load_coefficient_matrix(rolling=False):
+    # rolling=True swaps in each ticker's latest rolling betas when a history has been built
+    if rolling:
+        history = load_beta_history()
+        if history is not None:
+            return _rolling_matrix(table_version('coefficients'), _history_version())
+    return _coefficient_matrix(table_version('coefficients'))
+
+
+# === Rolling Betas ===
+# Written by `python -m finclusters.factor_models ... --rolling 60`
+BETA_HISTORY_PATH = ROOT / 'rolling_betas.npz'
+
+
+@dataclass(frozen=True)
+class BetaHistory:
+    months: np.ndarray   # (T,) 'YYYY-MM'
+    tickers: np.ndarray  # (n,) upper-case tickers
+    row: dict            # ticker -> column in betas
+    model: np.ndarray    # (n,) model each ticker was fitted with
+    window: int          # months per regression
+    betas: np.ndarray    # (T, n, 5) intercept, coef_1..coef_4; NaN where the window is too thin
+
+    def __contains__(self, ticker):
+        return ticker in self.row
+
+    def history(self, ticker):
+        # Month-indexed coefficients of the ticker's own model
+        i = self.row[ticker]
+        k = MODEL_FACTORS.get(self.model[i], N_FACTORS)
+        columns = ["intercept"] + [f"coef_{j}" for j in range(1, k + 1)]
+        return pd.DataFrame(self.betas[:, i, :k + 1], index=pd.PeriodIndex(self.months, freq='M'), columns=columns).dropna()
+
+    def latest(self):
+        # (n, 5) coefficients from each ticker's last estimated month, and that month ('' if never)
+        estimated = ~np.isnan(self.betas[:, :, 0])
+        last = len(self.months) - 1 - np.argmax(estimated[::-1], axis=0)
+        coefs = self.betas[last, np.arange(len(self.tickers))]
+        ever = estimated.any(axis=0)
+        coefs[~ever] = np.nan
+        return coefs, np.where(ever, self.months[last], '')
+
+
+def read_beta_history(path=BETA_HISTORY_PATH):
+    with np.load(path, allow_pickle=False) as data:
+        tickers = data['tickers']
+        return BetaHistory(
+            data['months'], tickers, {t: i for i, t in enumerate(tickers.tolist())},
+            data['model'], int(data['window']), data['betas'].astype(float)
+        )
+
+
+def with_rolling_betas(matrix, history):
+    # Copy of the coefficient matrix with each ticker's latest rolling coefficients and model swapped in
+    coefs, _ = history.latest()
+    rows = np.array([matrix.row.get(t, -1) for t in history.tickers.tolist()], dtype=np.intp)
+    use = (rows >= 0) & ~np.isnan(coefs[:, 0])
+    rows = rows[use]
+
+    model = matrix.model.astype(object)
+    model_code = matrix.model_code.copy()
+    new_coefs = matrix.coefs.copy()
+    valid = matrix.valid.copy()
+    model[rows] = history.model[use]
+    model_code[rows] = [MODELS.index(m) if m in MODELS else -1 for m in history.model[use]]
+    new_coefs[rows] = np.nan_to_num(coefs[use])
+    valid[rows] = model_code[rows] >= 0
+    return CoefficientMatrix(matrix.tickers, matrix.row, matrix.sector, model, model_code, new_coefs, valid)
+
+
+def _history_version():
+    try:
+        return BETA_HISTORY_PATH.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+@track_cache(st.cache_resource)
+def _beta_history(version):
+    return read_beta_history()
+
+
+def load_beta_history():
+    # None until a rolling history has been built
+    version = _history_version()
+    return None if version is None else _beta_history(version)
+
+
+@track_cache(st.cache_resource)
+def _rolling_matrix(version, history_version):
+    return with_rolling_betas(_coefficient_matrix(version), _beta_history(history_version))
+
+
+def factor_matrix(premia=None, capm_premium=None):
+    # (len(MODELS), 4) matrix: one zero-padded factor vector per model
+    premia = {**FACTOR_PREMIA, **(premia or {})}
+    if capm_premium is not None:
+        premia["CAPM"] = [capm_premium]
+    factors = np.zeros((len(MODELS), N_FACTORS))
+    for code, name in enumerate(MODELS):
+        factors[code, :len(premia[name])] = premia[name]
+    return factors
+
+
+def expected_returns(matrix, rows, factors, rf):
+    # Expected return for every row under every factor scenario in one matmul.
+    # factors: (M, 4) from factor_matrix, or (S, M, 4) for S scenarios
+    # rf: scalar or (S,) risk-free rates
+    # Returns (n,) for a single scenario, else (S, n); invalid rows are NaN.
+    factors = np.asarray(factors, dtype=float)
+    single = factors.ndim == 2
+    factors = factors.reshape(-1, len(MODELS), N_FACTORS)
+    n_scenarios = factors.shape[0]
+
+    coefs = matrix.coefs[rows]
+    codes = matrix.model_code[rows].astype(np.intp)
+
+    # (n, 4) @ (4, S*M) -> (n, S, M), then keep each row's own model
+    loadings = (coefs[:, 1:] @ factors.reshape(-1, N_FACTORS).T).reshape(len(rows), n_scenarios, len(MODELS))
+    picked = np.take_along_axis(loadings, np.clip(codes, 0, None)[:, None, None], axis=2)[:, :, 0]
+
+    out = (picked + coefs[:, :1]).T + np.broadcast_to(np.asarray(rf, dtype=float), (n_scenarios,))[:, None]
+    out[:, ~matrix.valid[rows]] = np.nan
+    return out[0] if single else out
@@ -0,0 +1,128 @@
+import argparse
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from finclusters.registry import REGISTRY, manifest
+from finclusters.sectors import read_models, sector_path
+
+# Rows scored per NumPy block; bounds the (rows x clusters) distance matrix
+CHUNK_SIZE = 50_000
+
+
+# === Fitted Model Arrays ===
+# The pickled scaler/KMeans/PCA reduced to the arrays needed for
+# scaler -> kmeans -> pca, so scoring is plain NumPy without per-call sklearn validation.
+@dataclass(frozen=True)
+class SectorScorer:
+    features: list
+    mean: np.ndarray
+    scale: np.ndarray
+    centers: np.ndarray
+    centers_sq: np.ndarray
+    pca_mean: np.ndarray
+    pca_components: np.ndarray
+
+    @classmethod
+    def from_models(cls, features, scaler, kmeans, pca):
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(len(features))
+        scale = scaler.scale_ if scaler.with_std else np.ones(len(features))
+        components = pca.components_[:2].T
+        if pca.whiten:
+            components = components / np.sqrt(pca.explained_variance_[:2])
+        centers = kmeans.cluster_centers_
+        return cls(
+            features=list(features),
+            mean=mean,
+            scale=scale,
+            centers=centers,
+            centers_sq=(centers ** 2).sum(axis=1),
+            pca_mean=pca.mean_,
+            pca_components=components,
+        )
+
+    def score(self, X):
+        # X: (n, features) raw ratios -> (cluster, pca) with cluster -1 / NaN for incomplete rows
+        Z = (X - self.mean) / self.scale
+        # argmin ||z - c||^2 == argmin (||c||^2 - 2 z.c)
+        cluster = np.argmin(self.centers_sq - 2 * Z @ self.centers.T, axis=1)
+        pcs = (Z - self.pca_mean) @ self.pca_components
+        incomplete = np.isnan(X).any(axis=1)
+        cluster[incomplete] = -1
+        pcs[incomplete] = np.nan
+        return cluster, pcs
+
+
+def load_scorer(sector_key):
+    scaler, kmeans, pca = read_models(sector_key)
+    return SectorScorer.from_models(manifest(sector_key).features, scaler, kmeans, pca)
+
+
+def score_frame(sector_key, df, scorer=None, chunk_size=CHUNK_SIZE):
+    # Returns cluster, pca_1 and pca_2 aligned with df.index
+    scorer = scorer or load_scorer(sector_key)
+    missing = [f for f in scorer.features if f not in df.columns]
+    if missing:
+        raise ValueError(f"{sector_key} scoring needs missing feature columns: {', '.join(missing)}")
+
+    X = df[scorer.features].to_numpy(dtype=float)
+    cluster = np.empty(len(X), dtype=np.int64)
+    pcs = np.empty((len(X), 2))
+    for start in range(0, len(X), chunk_size):
+        stop = start + chunk_size
+        cluster[start:stop], pcs[start:stop] = scorer.score(X[start:stop])
+    return pd.DataFrame({'cluster': cluster, 'pca_1': pcs[:, 0], 'pca_2': pcs[:, 1]}, index=df.index)
+
+
+def score_csv(sector_key, source, destination, chunk_size=CHUNK_SIZE):
+    # Streams a CSV of any size through the models, replacing cluster/pca columns
+    scorer = load_scorer(sector_key)
+    rows = 0
+    for i, chunk in enumerate(pd.read_csv(source, chunksize=chunk_size)):
+        scores = score_frame(sector_key, chunk, scorer=scorer, chunk_size=chunk_size)
+        chunk = chunk.drop(columns=[c for c in scores.columns if c in chunk.columns]).join(scores)
+        chunk.to_csv(destination, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(chunk)
+    return rows
+
+
+# === CLI ===
+# python -m finclusters.scoring --sector GICS_35 new_filings.csv -o scored.csv
+# python -m finclusters.scoring --all --output-dir rescored/
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-assign clusters and PCA coordinates with the stored sector models.")
+    parser.add_argument('input', nargs='?', help="CSV of raw ratios to score")
+    parser.add_argument('--sector', choices=sorted(REGISTRY), help="GICS sector of the input rows")
+    parser.add_argument('-o', '--output', help="Where to write the scored CSV")
+    parser.add_argument('--all', action='store_true', help="Rescore every sector's bundled data store")
+    parser.add_argument('--output-dir', default='rescored', help="Output directory for --all")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.all:
+        jobs = [
+            (key, sector_path(key, 'data'), Path(args.output_dir) / sector_path(key, 'data').name)
+            for key in REGISTRY
+        ]
+        Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    elif args.input and args.sector and args.output:
+        jobs = [(args.sector, Path(args.input), Path(args.output))]
+    else:
+        parser.error("pass --all, or an input CSV with --sector and --output")
+
+    failed = False
+    for sector_key, source, destination in jobs:
+        try:
+            rows = score_csv(sector_key, source, destination, chunk_size=args.chunk_size)
+            print(f"{sector_key}: scored {rows} rows -> {destination}")
+        except ValueError as e:
+            print(f"{sector_key}: {e}", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from finclusters.data_sources import load_table, table_version
+from finclusters.forecast import TERMINAL_GROWTH
+from finclusters.instrumentation import track_cache
+from finclusters.market_data import TTLS, peek_infos
+from finclusters.returns import FORWARD_MARKET_PREMIUM, expected_returns, factor_matrix, load_coefficient_matrix
+from finclusters.sectors import latest_clusters
+
+# === Universe Screener ===
+# Every ticker in the coefficient table plus every active company, scored
+# with the vectorized return engine and the per-sector peer indexes.
+SCREEN_COLUMNS = [
+    'Ticker', 'Sector', 'Cluster', 'Model', 'Expected Return', 'Peer Percentile',
+    'Forward EPS', 'Current Price', 'Implied Price', 'Upside',
+]
+
+
+def build_screen(rf, capm_premium=FORWARD_MARKET_PREMIUM, terminal_growth=TERMINAL_GROWTH):
+    coeff_matrix = load_coefficient_matrix()
+    all_rows = np.arange(len(coeff_matrix.tickers))
+    screen = pd.DataFrame({
+        'Ticker': coeff_matrix.tickers,
+        'Sector': coeff_matrix.sector,
+        'Model': coeff_matrix.model,
+        'Expected Return': expected_returns(coeff_matrix, all_rows, factor_matrix(capm_premium=capm_premium), rf),
+    }).drop_duplicates('Ticker')
+
+    # Active companies without coefficients still get a sector and cluster
+    active = load_table('active_companies')
+    active = pd.DataFrame({
+        'Ticker': active['Ticker'].astype(str).str.upper(),
+        'Sector': 'GICS_' + active['GIC_Sector'].astype(str),
+    })
+    screen = pd.concat([screen, active[~active['Ticker'].isin(screen['Ticker'])]], ignore_index=True)
+
+    clusters = latest_clusters()
+    screen = screen.merge(clusters[['Ticker', 'Cluster']], on='Ticker', how='left')
+    screen['Cluster'] = screen['Cluster'].astype('Int64')
+
+    # Where each ticker's expected return sits among its cluster peers (0-100)
+    groups = screen.groupby(['Sector', 'Cluster'], dropna=True)['Expected Return']
+    screen['Peer Percentile'] = groups.rank(pct=True) * 100
+
+    # Implied Gordon price only from market data that is already cached
+    infos = peek_infos(screen['Ticker'])
+    for column, field in [('Forward EPS', 'forwardEps'), ('Current Price', 'currentPrice')]:
+        screen[column] = pd.to_numeric(
+            pd.Series([infos.get(t, {}).get(field) for t in screen['Ticker']], dtype=object), errors='coerce'
+        ).to_numpy(dtype=float)
+    spread = screen['Expected Return'].to_numpy(dtype=float) - terminal_growth
+    with np.errstate(divide='ignore', invalid='ignore'):
+        implied = np.where(spread > 0, screen['Forward EPS'].to_numpy() / spread, np.nan)
+        screen['Upside'] = implied / screen['Current Price'].to_numpy() - 1
+    screen['Implied Price'] = implied
+    return screen[SCREEN_COLUMNS].sort_values('Expected Return', ascending=False, na_position='last').reset_index(drop=True)
+
+
+@track_cache(st.cache_data(ttl=TTLS['info'], show_spinner="Screening the universe..."))
+def cached_screen(rf, capm_premium, coefficients_version, active_version):
+    # Recomputed when the inputs or either reference table change, or when cached market data may have moved
+    return build_screen(rf, capm_premium)
+
+
+def load_screen(rf, capm_premium=FORWARD_MARKET_PREMIUM):
+    return cached_screen(rf, capm_premium, table_version('coefficients'), table_version('active_companies'))
+
+
+# === CLI ===
+# python -m finclusters.screener --rf 4.2 --sector GICS_45 --top 25
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank every ticker by model expected return.")
+    parser.add_argument('--rf', type=float, default=4.0, help="Risk-free rate in percent")
+    parser.add_argument('--historical-premium', action='store_true', help="Use the historical CAPM market premium instead of the forward-looking one")
+    parser.add_argument('--sector', action='append', help="Only these sectors (repeatable)")
+    parser.add_argument('--sort', default='Expected Return', choices=SCREEN_COLUMNS)
+    parser.add_argument('--ascending', action='store_true')
+    parser.add_argument('--top', type=int, help="Show only the first N rows")
+    parser.add_argument('-o', '--output', help="Write the full result to CSV")
+    args = parser.parse_args(argv)
+
+    capm_premium = None if args.historical_premium else FORWARD_MARKET_PREMIUM
+    screen = build_screen(args.rf / 100, capm_premium)
+    if args.sector:
+        screen = screen[screen['Sector'].isin(args.sector)]
+    screen = screen.sort_values(args.sort, ascending=args.ascending, na_position='last')
+    if args.output:
+        screen.to_csv(args.output, index=False)
+    print((screen.head(args.top) if args.top else screen).to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
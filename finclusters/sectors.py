@@ -0,0 +1,131 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from finclusters.data_sources import load_table, table_version
+from finclusters.instrumentation import timed, track_cache
+from finclusters.registry import MAX_LOADED_SECTORS, REGISTRY, check_models, manifest
+
+# === Sector Artifacts ===
+# Paths, features and checksums come from models/<sector>/manifest.json (see finclusters.registry)
+def sector_path(sector_key, kind):
+    return manifest(sector_key).path(kind)
+
+
+def data_version(sector_key):
+    # Changes whenever the clustered CSV is rewritten or appended to (e.g. by finclusters.pipeline)
+    return os.stat(sector_path(sector_key, 'data')).st_mtime_ns
+
+
+# === Model Loader ===
+def read_models(sector_key):
+    # joblib (and sklearn via unpickling) is only imported once a sector is needed
+    check_models(sector_key)
+    with timed('joblib.load'):
+        import joblib
+
+        scaler = joblib.load(sector_path(sector_key, 'scaler'))
+        kmeans = joblib.load(sector_path(sector_key, 'kmeans'))
+        pca = joblib.load(sector_path(sector_key, 'pca'))
+    return scaler, kmeans, pca
+
+
+# Loaded on first use; beyond MAX_LOADED_SECTORS the least recently used sector is dropped
+@track_cache(st.cache_resource(max_entries=MAX_LOADED_SECTORS))
+def _models_and_data(sector_key, version):
+    scaler, kmeans, pca = read_models(sector_key)
+    # Imported here because finclusters.store imports this module
+    from finclusters.store import read_sector_frame
+    df = read_sector_frame(sector_key)
+    features = manifest(sector_key).features
+    return scaler, kmeans, pca, df, features
+
+
+def load_models_and_data(sector_key, version=None):
+    # Keyed on the data version so rows appended while the app runs are picked up;
+    # derived caches pass the version they were keyed on to read the same frame
+    return _models_and_data(sector_key, data_version(sector_key) if version is None else version)
+
+
+@track_cache(st.cache_resource)
+def _active_tickers(version):
+    active_companies_df = load_table('active_companies')
+    return frozenset(active_companies_df['Ticker'].str.upper())
+
+
+def load_active_tickers():
+    return _active_tickers(table_version('active_companies'))
+
+
+# === Peer Index ===
+# Built once per sector so a rerun only does dict lookups instead of
+# filtering, sorting and de-duplicating the whole sector DataFrame.
+@dataclass(frozen=True)
+class PeerIndex:
+    # ticker -> positional row of the ticker's latest fiscal year in df
+    latest_row: dict
+    # cluster -> sorted tuple of active tickers with any year in that cluster
+    cluster_peers: dict
+
+    def __contains__(self, ticker):
+        return ticker in self.latest_row
+
+    def company_row(self, ticker):
+        return self.latest_row[ticker]
+
+    def peers(self, cluster_id):
+        return self.cluster_peers.get(cluster_id, ())
+
+
+@timed('build peer index')
+def build_peer_index(df, active_tickers):
+    tickers = df['tic'].astype(str).to_numpy()
+    fyears = df['fyear'].to_numpy()
+    clusters = df['cluster'].to_numpy().astype(int)
+
+    # Stable sort by (ticker, fyear) so the last row of each ticker run is its latest year
+    order = np.lexsort((fyears, tickers))
+    sorted_tickers = tickers[order]
+    is_last = np.append(sorted_tickers[1:] != sorted_tickers[:-1], True)
+    latest_row = dict(zip(sorted_tickers[is_last].tolist(), order[is_last].tolist()))
+
+    # Unique (cluster, ticker) pairs restricted to active tickers, grouped by cluster
+    pairs = pd.DataFrame({'cluster': clusters, 'tic': df['tic'].astype(str).str.upper().to_numpy()}).drop_duplicates()
+    pairs = pairs[pairs['tic'].isin(active_tickers)].sort_values(['cluster', 'tic'])
+    cluster_peers = {
+        int(cluster_id): tuple(group.tolist())
+        for cluster_id, group in pairs.groupby('cluster', sort=False)['tic']
+    }
+    return PeerIndex(latest_row=latest_row, cluster_peers=cluster_peers)
+
+
+@track_cache(st.cache_resource(max_entries=MAX_LOADED_SECTORS))
+def _peer_index(sector_key, version, active_version):
+    _, _, _, df, _ = load_models_and_data(sector_key, version)
+    return build_peer_index(df, load_active_tickers())
+
+
+def load_peer_index(sector_key, version=None):
+    # Rebuilt when the sector data changes or a newer Active_Companies.csv has been swapped in.
+    # Pass the version used for load_models_and_data so row positions refer to the same frame.
+    version = data_version(sector_key) if version is None else version
+    return _peer_index(sector_key, version, table_version('active_companies'))
+
+
+def latest_clusters():
+    # Ticker, Sector and latest-year Cluster for every sector with a model
+    frames = []
+    for sector_key in REGISTRY:
+        version = data_version(sector_key)
+        _, _, _, df, _ = load_models_and_data(sector_key, version)
+        latest = load_peer_index(sector_key, version).latest_row
+        rows = np.fromiter(latest.values(), dtype=np.intp, count=len(latest))
+        frames.append(pd.DataFrame({
+            'Ticker': [t.upper() for t in latest],
+            'Sector': sector_key,
+            'Cluster': df['cluster'].to_numpy()[rows].astype(int),
+        }))
+    return pd.concat(frames, ignore_index=True).drop_duplicates('Ticker')
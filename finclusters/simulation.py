@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from finclusters.forecast import TERMINAL_GROWTH
+from finclusters.returns import N_FACTORS, expected_returns
+
+# === Factor Uncertainty ===
+# Draws share one shock vector across models: a row's factors are its model's
+# mean premia (factor_matrix) plus the draw's shock on the factors it uses.
+DEFAULT_FACTOR_STD = [0.02, 0.015, 0.015, 0.02]
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Histogram resolution and range (in standard deviations) for streaming percentiles
+BINS = 2000
+RANGE_SD = 6.0
+
+# Upper bound on the (rows x draws) block held in memory at once
+MAX_BLOCK = 4_000_000
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    n_draws: int
+    percentiles: tuple
+    mean_return: np.ndarray          # (n,)
+    return_percentiles: np.ndarray   # (n, len(percentiles))
+    prob_valid: np.ndarray           # (n,) share of draws with return > terminal growth
+    price_percentiles: np.ndarray    # (n, len(percentiles)), NaN without EPS
+
+
+def factor_covariance(std=DEFAULT_FACTOR_STD, correlation=0.0):
+    std = np.asarray(std, dtype=float)
+    corr = np.full((len(std), len(std)), correlation)
+    np.fill_diagonal(corr, 1.0)
+    return corr * np.outer(std, std)
+
+
+def _histogram_percentiles(counts, lo, width, levels):
+    # counts: (n, bins); levels in [0, 1] per row -> (n, len(levels)) by linear interpolation
+    cum = np.cumsum(counts, axis=1)
+    total = cum[:, -1:]
+    targets = levels * total
+    out = np.empty(targets.shape)
+    for j in range(targets.shape[1]):
+        idx = np.minimum((cum < targets[:, j:j + 1]).sum(axis=1), counts.shape[1] - 1)
+        before = np.where(idx > 0, cum[np.arange(len(cum)), idx - 1], 0)
+        in_bin = np.maximum(counts[np.arange(len(cum)), idx], 1)
+        frac = np.clip((targets[:, j] - before) / in_bin, 0, 1)
+        out[:, j] = lo + (idx + frac) * width
+    return out
+
+
+def simulate(matrix, rows, factors, cov, rf, n_draws, eps=None, terminal_growth=TERMINAL_GROWTH,
+             seed=0, batch_size=100_000, percentiles=PERCENTILES):
+    # Expected-return (and Gordon price) distribution for `rows` under random factor premia.
+    # Memory stays bounded by streaming draws in batches into per-row histograms.
+    rows = np.asarray(rows, dtype=np.intp)
+    n = len(rows)
+    rng = np.random.default_rng(seed)
+    cov = np.asarray(cov, dtype=float)
+
+    base = expected_returns(matrix, rows, factors, rf)           # (n,)
+    loadings = matrix.coefs[rows, 1:]                           # (n, 4), zero beyond each model's factors
+    sd = np.sqrt(np.einsum('ij,jk,ik->i', loadings, cov, loadings))
+    ok = ~np.isnan(base)
+
+    # Expected return is normal given normal shocks, so +-RANGE_SD covers the histogram range
+    half = np.where(sd > 0, RANGE_SD * sd, 1e-6)
+    lo = np.where(ok, base - half, 0.0)
+    width = np.where(ok, 2 * half / BINS, 1.0)
+
+    counts = np.zeros((n, BINS), dtype=np.int64)
+    total = np.zeros(n)
+    above_growth = np.zeros(n, dtype=np.int64)
+    offsets = (np.arange(n) * BINS)[:, None]
+
+    batch = max(1, min(batch_size, MAX_BLOCK // max(n, 1)))
+    chol = np.linalg.cholesky(cov + 1e-18 * np.eye(N_FACTORS))
+    drawn = 0
+    while drawn < n_draws:
+        size = min(batch, n_draws - drawn)
+        shocks = rng.standard_normal((size, N_FACTORS)) @ chol.T   # (size, 4)
+        returns = base[:, None] + loadings @ shocks.T              # (n, size)
+        idx = np.clip(((returns - lo[:, None]) / width[:, None]).astype(np.int64), 0, BINS - 1)
+        counts += np.bincount((idx + offsets).ravel(), minlength=n * BINS).reshape(n, BINS)
+        total += np.nansum(returns, axis=1)
+        above_growth += (returns > terminal_growth).sum(axis=1)
+        drawn += size
+
+    levels = np.asarray(percentiles, dtype=float) / 100
+    return_pct = _histogram_percentiles(counts, lo, width, np.broadcast_to(levels, (n, len(levels))))
+    prob_valid = above_growth / n_draws
+
+    # Price is decreasing in return for r > g, so the price percentile p among valid
+    # draws is the return quantile (1 - v) + v * (1 - p) of all draws, with v = P(r > g)
+    price_levels = (1 - prob_valid)[:, None] + prob_valid[:, None] * (1 - levels[None, :])
+    valid_return_pct = _histogram_percentiles(counts, lo, width, price_levels)
+    eps = np.full(n, np.nan) if eps is None else np.asarray(eps, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_pct = eps[:, None] / (valid_return_pct - terminal_growth)
+    price_pct[(valid_return_pct <= terminal_growth) | (prob_valid[:, None] == 0)] = np.nan
+
+    mean_return = total / n_draws
+    for arr in (mean_return, prob_valid):
+        arr[~ok] = np.nan
+    return_pct[~ok] = np.nan
+    price_pct[~ok] = np.nan
+    return SimulationResult(n_draws, tuple(percentiles), mean_return, return_pct, prob_valid, price_pct)
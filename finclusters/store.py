@@ -0,0 +1,115 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from finclusters.instrumentation import timed
+from finclusters.registry import REGISTRY, file_sha256, manifest
+from finclusters.sectors import sector_path
+
+# === Columnar Sector Store ===
+# Each clustered CSV is converted to an uncompressed Arrow IPC (Feather v2)
+# file holding only the columns the app reads, so workers can memory-map it
+# instead of parsing 40 Compustat columns on cold start.
+KEY_COLUMNS = ['gvkey', 'tic', 'fyear', 'cluster', 'pca_1', 'pca_2']
+DTYPES = {
+    'gvkey': np.int32,
+    'fyear': np.int16,
+    'cluster': np.int8,
+    'pca_1': np.float32,
+    'pca_2': np.float32,
+}
+SOURCE_HASH_KEY = b'finclusters.source_sha256'
+
+
+def store_columns(sector_key, columns):
+    features = manifest(sector_key).features
+    return [c for c in KEY_COLUMNS + features if c in columns]
+
+
+def to_store_frame(sector_key, df):
+    df = df[store_columns(sector_key, df.columns)].copy()
+    for col, dtype in DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    df['tic'] = df['tic'].astype(str).astype('category')
+    return df
+
+
+def write_store(sector_key, df=None):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    source = sector_path(sector_key, 'data')
+    if df is None:
+        df = pd.read_csv(source)
+    table = pa.Table.from_pandas(to_store_frame(sector_key, df), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        SOURCE_HASH_KEY: file_sha256(source).encode(),
+    })
+    destination = sector_path(sector_key, 'store')
+    # Written beside the old file and swapped in, so processes that have it mapped keep a valid view
+    tmp = destination.with_suffix('.tmp')
+    feather.write_feather(table, tmp, compression='uncompressed')
+    os.replace(tmp, destination)
+    return destination
+
+
+def append_store(sector_key, previous, rows):
+    # `previous` is the store frame read before `rows` (as written) were appended to the CSV;
+    # None (no valid store) rebuilds it from the CSV instead
+    if previous is None:
+        return write_store(sector_key)
+    new = to_store_frame(sector_key, rows)
+    combined = pd.concat([previous.astype({'tic': str}), new.astype({'tic': str})], ignore_index=True)
+    return write_store(sector_key, combined)
+
+
+def read_store(sector_key):
+    # Memory-mapped store for the sector, or None when it is missing or older than the CSV
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+
+    path = sector_path(sector_key, 'store')
+    if not path.exists():
+        return None
+    table = feather.read_table(path, memory_map=True)
+    recorded = (table.schema.metadata or {}).get(SOURCE_HASH_KEY, b'').decode()
+    if recorded != file_sha256(sector_path(sector_key, 'data')):
+        return None
+    # split_blocks keeps null-free numeric columns as views onto the mapped file
+    return table.to_pandas(split_blocks=True)
+
+
+def read_sector_frame(sector_key):
+    with timed('read sector store'):
+        df = read_store(sector_key)
+    if df is None:
+        with timed('read sector csv'):
+            df = to_store_frame(sector_key, pd.read_csv(sector_path(sector_key, 'data')))
+    return df
+
+
+# === CLI ===
+# python -m finclusters.store            rebuild every sector store
+# python -m finclusters.store GICS_35    rebuild one sector
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert clustered sector CSVs to memory-mappable Feather stores.")
+    parser.add_argument('sectors', nargs='*', help=f"Sectors to rebuild (default: all of {', '.join(sorted(REGISTRY))})")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.sectors if s not in REGISTRY]
+    if unknown:
+        parser.error(f"unknown sector(s): {', '.join(unknown)}")
+    for sector_key in args.sectors or REGISTRY:
+        destination = write_store(sector_key)
+        print(f"{sector_key}: wrote {destination.name} ({destination.stat().st_size / 1e6:.2f} MB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
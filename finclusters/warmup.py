@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+
+import streamlit as st
+
+from finclusters.instrumentation import ENABLED as DEBUG, observe
+
+logger = logging.getLogger(__name__)
+
+# Streamlit imports the main script when the first session connects
+PROCESS_START = time.perf_counter()
+
+
+def record(stage, seconds):
+    observe(stage, seconds)
+    logger.info("%s took %.3fs", stage, seconds)
+
+
+def warm_up():
+    # Fills the shared resource caches so the first ticker lookup in any
+    # sector does not pay the model/data load cost
+    from finclusters.charts import base_cluster_figure
+    from finclusters.history import load_cluster_history
+    from finclusters.neighbors import load_neighbor_index
+    from finclusters.returns import load_coefficient_matrix
+    from finclusters.registry import MAX_LOADED_SECTORS, REGISTRY
+    from finclusters.sectors import load_models_and_data, load_peer_index
+
+    start = time.perf_counter()
+    t = time.perf_counter()
+    load_coefficient_matrix()
+    record('warmup: coefficients', time.perf_counter() - t)
+
+    # Only as many sectors as stay resident; the rest load on first use
+    for sector_key in list(REGISTRY)[:MAX_LOADED_SECTORS]:
+        try:
+            t = time.perf_counter()
+            load_models_and_data(sector_key)
+            load_peer_index(sector_key)
+            load_neighbor_index(sector_key)
+            load_cluster_history(sector_key)
+            base_cluster_figure(sector_key)
+            record(f'warmup: {sector_key}', time.perf_counter() - t)
+        except Exception as e:
+            logger.warning("Warm-up of %s failed: %s", sector_key, e)
+
+    record('warmup: total', time.perf_counter() - start)
+    record('cold start (process start -> warm caches)', time.perf_counter() - PROCESS_START)
+
+
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    # Runs once per process; sessions that need a bundle before the thread
+    # reaches it simply wait on the same cache entry
+    thread = threading.Thread(target=warm_up, name='finclusters-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+_first_run_lock = threading.Lock()
+_first_run_done = False
+
+
+def record_first_interaction(seconds):
+    # Duration of the first completed page run in this process
+    global _first_run_done
+    with _first_run_lock:
+        if _first_run_done:
+            return
+        _first_run_done = True
+    record('first interaction', seconds)
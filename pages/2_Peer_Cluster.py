@@ -1,7 +1,13 @@
 import streamlit as st
 import pandas as pd
-import joblib
-import plotly.express as px
+
+from finclusters.charts import POINT_THRESHOLD, RENDER_MODES, cluster_figure
+from finclusters.history import load_cluster_history
+from finclusters.instrumentation import timed
+from finclusters.neighbors import load_neighbor_index
+from finclusters.registry import REGISTRY
+from finclusters.sectors import load_models_and_data
+from finclusters import derived
 
 st.title("📊 Peer Cluster Finder")
 
@@ -12,120 +18,102 @@ if not ticker:
     st.warning("⚠️ Please enter a stock ticker in the sidebar.")
     st.stop()
 
-# === Load Ticker & Sector Reference CSV ===
-TICKER_SECTOR_FILE = 'sector_model_coefficients_by_ticker_REPLACEMENT.csv'
-ticker_sector_df = pd.read_csv(TICKER_SECTOR_FILE)
-
-# === Load Active Companies CSV ===
-ACTIVE_COMPANIES_URL = "https://raw.githubusercontent.com/PraewLao/price-and-peers-app/refs/heads/main/Active_Companies.csv"
-active_companies_df = pd.read_csv(ACTIVE_COMPANIES_URL)
-active_tickers = set(active_companies_df['Ticker'].str.upper())
-
-# === Sector-Specific Model and Feature Config ===
-MODEL_CONFIG = {
-    'GICS_35': {
-        'scaler': 'scaler_hc.pkl',
-        'kmeans': 'kmeans_model_hc.pkl',
-        'pca': 'pca_transformer_hc.pkl',
-        'data': 'clustered_data_hc.csv',
-        'features': ['ROA', 'ROE', 'ROA_vol', 'ROE_vol', 'RD_Sales', 'Debt_Assets', 'Market_Book', 'WC_TA', 'RE_TA']
-    },
-    'GICS_25': {
-        'scaler': 'scaler_cd.pkl',
-        'kmeans': 'kmeans_model_cd.pkl',
-        'pca': 'pca_transformer_cd.pkl',
-        'data': 'clustered_data_cd.csv',
-        'features': ['ROA', 'ROE', 'RD_Sales', 'Debt_Assets', 'Market_Book', 'WC_TA', 'RE_TA', 'ROA_vol', 'ROE_vol']
-    },
-    'GICS_45': {
-        'scaler': 'scaler_IT.pkl',
-        'kmeans': 'kmeans_model_IT.pkl',
-        'pca': 'pca_transformer_IT.pkl',
-        'data': 'clustered_data_cd_IT.csv',
-        'features': ['ROA', 'ROE', 'ROA_vol', 'ROE_vol', 'RD_Sales', 'SGA_Sales', 'CapEx_Sales', 'Debt_Assets', 'Market_Book', 'WC_TA']
-    }
-}
-
-# === Model Loader ===
-@st.cache_resource
-def load_models_and_data(sector_key):
-    cfg = MODEL_CONFIG[sector_key]
-    scaler = joblib.load(cfg['scaler'])
-    kmeans = joblib.load(cfg['kmeans'])
-    pca = joblib.load(cfg['pca'])
-    df = pd.read_csv(cfg['data'])
-    features = cfg['features']
-    return scaler, kmeans, pca, df, features
-
 # === Main Logic ===
-if ticker in ticker_sector_df['ticker'].values:
-    sector_key = ticker_sector_df[ticker_sector_df['ticker'] == ticker]['sector'].iloc[0]
+# Sector, cluster and peers come from the shared derived-data layer so the other pages get the same values
+sector_key = derived.get('sector')
+if sector_key is not None:
 
     st.info(f"🔍 {ticker} belongs to **{sector_key}** sector.")
 
-    if sector_key in MODEL_CONFIG:
-        scaler, kmeans, pca, df, features = load_models_and_data(sector_key)
+    if sector_key in REGISTRY:
+        company_cluster = derived.get('cluster')
 
-        if ticker in df['tic'].values:
-            company = df[df['tic'] == ticker].iloc[0]
-            cluster_id = int(company['cluster'])
+        if company_cluster is not None:
+            # Same data version the cluster row was looked up in
+            version = company_cluster['version']
+            scaler, kmeans, pca, df, features = load_models_and_data(sector_key, version)
+            company = df.iloc[company_cluster['row']]
+            cluster_id = company_cluster['cluster']
 
             st.success(f"✅ {ticker} is in **Cluster {cluster_id}**")
 
             # === Peer Companies ===
-            # Get most recent data per ticker
-            peers_recent = (
-                df[df['cluster'] == cluster_id]
-                .sort_values(by=['tic', 'fyear'], ascending=[True, False])
-                .drop_duplicates(subset='tic')  # Keep latest year per ticker
-            )
-
-            
-            # Filter peers that are in active companies list
-            active_peers = peers_recent[peers_recent['tic'].isin(active_tickers)]
-            
-            # Save to session state for use on Page 2
-            st.session_state["peer_tickers"] = active_peers["tic"].str.upper().tolist()
-
-            
+            # Active peers (sorted) are precomputed per cluster in the peer index
+            active_peers = derived.get('peers')
+
             # Show only active peer tickers
-            if not active_peers.empty:
+            if active_peers:
                 st.subheader("🏢 Active Peer Companies")
-                sorted_peers = active_peers[['tic']].rename(columns={'tic': 'Ticker'}).sort_values(by='Ticker').reset_index(drop=True)
+                sorted_peers = pd.DataFrame({'Ticker': active_peers})
                 st.dataframe(sorted_peers, use_container_width=True, hide_index=True)
             else:
                 st.warning("⚠️ No active peers found for this cluster.")
 
+            # === Closest Peers ===
+            # Ranked by distance in the standardized ratio space (nearest fiscal year per peer)
+            neighbor_index = load_neighbor_index(sector_key, version)
+            # The ticker itself is not a candidate (it may or may not be in the active list)
+            candidates = [p for p in active_peers if p != ticker]
+            if candidates:
+                st.subheader("🎯 Closest Peers")
+                if len(candidates) > 1:
+                    top_n = st.slider("Number of closest peers", min_value=1, max_value=min(50, len(candidates)), value=min(10, len(candidates)))
+                else:
+                    top_n = 1
+                with timed("peer cluster: closest peers"):
+                    closest = neighbor_index.closest(
+                        cluster_id, company[neighbor_index.features].to_numpy(dtype=float), top_n, exclude=(ticker,)
+                    )
+                closest_df = pd.DataFrame(closest, columns=['Ticker', 'Distance', 'Closest Year'])
+                st.dataframe(closest_df, use_container_width=True, hide_index=True)
+
+
+
+            # === Cluster History ===
+            # Precomputed per sector: the company's fiscal-year path and year-to-year migration counts
+            history = load_cluster_history(sector_key, version)
+            path = history.path(ticker) if ticker in history else None
+            if path is not None:
+                st.subheader("🕰️ Cluster History")
+                st.dataframe(
+                    path[['fyear', 'cluster']].rename(columns={'fyear': 'Fiscal Year', 'cluster': 'Cluster'}).set_index('Fiscal Year').T,
+                    use_container_width=True
+                )
 
+                year_options = ["All years"] + history.years.tolist()
+                year = st.selectbox(
+                    "Migration probabilities for", options=year_options,
+                    format_func=lambda y: y if y == "All years" else f"FY{y - 1} → FY{y}"
+                )
+                migration = history.migration(None if year == "All years" else year)
+                labels = [f"Cluster {c}" for c in range(len(migration))]
+                if cluster_id < len(migration) and not pd.isna(migration[cluster_id]).all():
+                    st.markdown(f"**Where Cluster {cluster_id} companies go next year**")
+                    outgoing = pd.DataFrame({'Next-Year Cluster': labels, 'Probability': migration[cluster_id]})
+                    st.dataframe(outgoing.style.format({'Probability': "{:.1%}"}), use_container_width=True, hide_index=True)
+                else:
+                    st.info(f"No year-to-year moves out of Cluster {cluster_id} in this period.")
+                with st.expander("Full migration matrix (rows: this year, columns: next year)"):
+                    matrix_df = pd.DataFrame(migration, index=labels, columns=labels)
+                    st.dataframe(matrix_df.style.format("{:.1%}", na_rep="–"), use_container_width=True)
 
             # === Cluster Visualization ===
             if 'pca_1' in df.columns and 'pca_2' in df.columns:
                 st.subheader("🧭 PCA Cluster Visualization")
 
-                # Add hover text combining ticker and fiscal year
-                df['hover_text'] = df['tic'] + " | Year: " + df['fyear'].astype(str)
-
-                fig = px.scatter(
-                    df, x='pca_1', y='pca_2', color='cluster',
-                    hover_name='hover_text',
-                    hover_data={'fyear': False, 'pca_1': False, 'pca_2': False},
-                    color_continuous_scale='Viridis',
-                    opacity=0.6,
-                    title='PCA Cluster View '
-                )
+                # Large sectors can switch to a sampled or density view to cut payload size
+                render_mode = 'webgl'
+                if len(df) > POINT_THRESHOLD:
+                    render_mode = st.radio(
+                        "Plot mode", options=list(RENDER_MODES), format_func=RENDER_MODES.get, horizontal=True
+                    )
 
-                # Highlight selected company
-                fig.add_scatter(
-                    x=[company['pca_1']], y=[company['pca_2']],
-                    mode='markers+text',
-                    marker=dict(color='red', size=12, line=dict(color='black', width=1)),
-                    text=[ticker],
-                    textposition='top center',
-                    name='Selected Company'
-                )
+                show_path = path is not None and len(path) > 1 and st.checkbox("Show path across fiscal years", value=True)
 
-                fig.update_layout(height=600, width=900)
-                st.plotly_chart(fig, use_container_width=True)
+                # Base figure is cached per sector; only the selected company's marker and path are added here
+                with timed("peer cluster: plotly chart"):
+                    fig = cluster_figure(sector_key, company, ticker, render_mode, path if show_path else None, version)
+                    st.plotly_chart(fig, use_container_width=True)
         else:
             st.error("❌ Ticker not found in sector-specific data.")
     else:
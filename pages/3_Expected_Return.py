@@ -1,7 +1,13 @@
 import streamlit as st
-import yfinance as yf
-import pandas as pd
 import numpy as np
+import pandas as pd
+
+from finclusters import derived
+from finclusters.forecast import TERMINAL_GROWTH
+from finclusters.instrumentation import timed, track_cache
+from finclusters.market_data import fetch_infos, get_info, peek_infos
+from finclusters.returns import FACTOR_PREMIA, FORWARD_MARKET_PREMIUM, factor_matrix, load_beta_history, load_coefficient_matrix
+from finclusters.simulation import DEFAULT_FACTOR_STD, PERCENTILES, factor_covariance, simulate
 
 # === Get ticker from global session state ===
 ticker = st.session_state.get("ticker", "")
@@ -10,28 +16,26 @@ if not ticker:
     st.warning("⚠️ Please enter a stock ticker in the sidebar.")
     st.stop()
 
-# Load model coefficients from CSV
-@st.cache_data
-def load_coefficients():
-    url = "https://raw.githubusercontent.com/PraewLao/price-and-peers-app/main/sector_model_coefficients_by_ticker_REPLACEMENT.csv"
-    return pd.read_csv(url)
-
-# Get default 10-year treasury yield from Yahoo Finance
-@st.cache_data
-def get_default_rf():
-    try:
-        rf_yield = yf.Ticker("^TNX").info["regularMarketPrice"] / 100
-        return round(rf_yield * 100, 2)
-    except:
-        return 4.0
-
-# Load model data and treasury yield
-coeff_df = load_coefficients()
-default_rf = get_default_rf()
+# Monte Carlo over factor premia; cached on its inputs
+@track_cache(st.cache_data(show_spinner="Simulating factor scenarios..."))
+def run_simulation(tickers, means, std, correlation, capm_premium, rf, n_draws, seed, eps, rolling=False):
+    coeff_matrix = load_coefficient_matrix(rolling=rolling)
+    premia = {"FF3": list(means[:3]), "Carhart": list(means)}
+    factors = factor_matrix(premia, capm_premium=capm_premium if capm_premium is not None else means[0])
+    return simulate(
+        coeff_matrix, coeff_matrix.rows(tickers), factors, factor_covariance(std, correlation),
+        rf, n_draws, eps=eps, seed=seed
+    )
+
+# Load model data
+beta_history = load_beta_history()
+if "rolling_input" not in st.session_state:
+    st.session_state["rolling_input"] = st.session_state.get("use_rolling_betas", False)
 
 # === MAIN PAGE ===
 try:
-    stock_info = yf.Ticker(ticker).info
+    with timed("expected return: market info"):
+        stock_info = get_info(ticker)
     company_name = stock_info.get("longName", ticker.upper())
     sector_name = stock_info.get("sector", "Unknown")
 
@@ -45,46 +49,54 @@ try:
     st.title(f"📈 Expected Return on {company_name} ({ticker.upper()})")
     st.markdown(f"*Sector:* ⁠ {sector_name} ⁠")
 
+    # Latest rolling betas instead of the static table, once a history has been built
+    use_rolling = False
+    if beta_history is not None and ticker.upper() in beta_history:
+        use_rolling = st.toggle(f"Use latest {beta_history.window}-month rolling betas?", key="rolling_input")
+    st.session_state["use_rolling_betas"] = use_rolling
+    coeff_matrix = load_coefficient_matrix(rolling=use_rolling)
+
     # Match ticker with model coefficients
-    row = coeff_df[coeff_df["ticker"].str.upper() == ticker.upper()]
-    if row.empty:
+    model_info = derived.get('model_return')
+    if model_info is None:
         st.error("❌ Ticker not found in model data.")
         st.stop()
 
-    model_type = row["model"].values[0]
-    intercept = row["intercept"].values[0]
-    st.markdown(f"*Model used*: ⁠ {model_type} ⁠")
+    model_type = model_info['model']
+    st.markdown(f"*Model used*: ⁠ {model_type} ⁠")
 
-    # Extract sector code from CSV (e.g. GICS_35, GICS_45)
-    sector_code = row["sector"].values[0] if "sector" in row.columns else "Unknown"
-
-    # Extract coefficients
-    coefs = []
-    for i in range(1, 5):
-        col = f"coef_{i}"
-        if col in row.columns and not pd.isna(row[col].values[0]):
-            coefs.append(row[col].values[0])
+    if use_rolling:
+        betas = beta_history.history(ticker.upper())
+        with st.expander(f"📉 {beta_history.window}-month rolling betas"):
+            if betas.empty:
+                st.info("Not enough monthly returns for a rolling estimate yet.")
+            else:
+                st.caption(f"Latest estimate: {betas.index[-1]}")
+                st.line_chart(betas.drop(columns="intercept").set_axis(betas.index.to_timestamp()))
 
-    # Default factor inputs
-    factor_inputs = {
-        "CAPM": [0.01],
-        "FF3": [0.01, 0.02, -0.01],
-        "Carhart": [0.01, 0.02, -0.01, 0.015]
-    }
+    # Inputs live in session state so the other pages see them; widget keys are
+    # seeded from it because Streamlit drops widget state when the page is left
+    if "forward_input" not in st.session_state:
+        st.session_state["forward_input"] = st.session_state.get("use_forward_premium", False)
+    if "rf_input" not in st.session_state:
+        st.session_state["rf_input"] = round(derived.current_inputs()['rf'] * 100, 2)
 
     # Show toggle if CAPM and GICS_35 or GICS_45
-    if model_type == "CAPM" and sector_code in ["GICS_35", "GICS_45"]:
-        use_forward = st.toggle("Use forward-looking market premium?", value=False)
-        factor_inputs["CAPM"] = [0.0442] if use_forward else [0.01]
+    capm_premium = None
+    if model_info['forward_toggle']:
+        use_forward = st.toggle("Use forward-looking market premium?", key="forward_input")
+        st.session_state["use_forward_premium"] = use_forward
+        capm_premium = FORWARD_MARKET_PREMIUM if use_forward else None
 
     # Calculate expected return
-    x = np.array(factor_inputs[model_type])
-    rf_percent = st.number_input("Enter Risk-Free Rate (%)", min_value=0.0, max_value=100.0, value=default_rf)
+    rf_percent = st.number_input("Enter Risk-Free Rate (%)", min_value=0.0, max_value=100.0, key="rf_input")
     rf = rf_percent / 100
-    monthly_return = intercept + np.dot(coefs, x) + rf
+    st.session_state["risk_free_rate"] = rf
 
-    # Save to session state for Page 3
-    st.session_state["expected_return"] = monthly_return
+    monthly_return = derived.get('model_return')['expected_return']
+    if monthly_return is None:
+        st.error("❌ Model coefficients for this ticker are incomplete.")
+        st.stop()
 
     st.success(f"🧠 Expected Return on {ticker.upper()}: *{round(monthly_return * 100, 2)}%*")
 
@@ -92,56 +104,80 @@ try:
     st.markdown("---")
     st.subheader("📊 Expected Return Range of Peers")
 
+    peer_tickers = derived.get('peers')
     try:
-        peer_returns = []
-
-        if "peer_tickers" not in st.session_state or not st.session_state["peer_tickers"]:
-            st.info("No peer tickers found from Page 1.")
+        peer_range = derived.get('peer_range')
+        if not peer_tickers:
+            st.info("No peer tickers found for this company's cluster.")
+        elif peer_range is not None:
+            st.success(f"📉 Lowest Peer Return: *{peer_range[0]:.2%}*")
+            st.success(f"📈 Highest Peer Return: *{peer_range[1]:.2%}*")
         else:
-            for peer_ticker in st.session_state["peer_tickers"]:
-                peer_row = coeff_df[coeff_df["ticker"].str.upper() == peer_ticker]
-                if peer_row.empty:
-                    continue
-
-                peer_row = peer_row.iloc[0]
-                model = peer_row["model"]
-                intercept_peer = peer_row["intercept"]
-
-                # Get coefficients
-                coefs_peer = []
-                for i in range(1, 5):
-                    col = f"coef_{i}"
-                    if col in peer_row and not pd.isna(peer_row[col]):
-                        coefs_peer.append(peer_row[col])
-
-                # Get factor vector
-                if model == "CAPM":
-                    x_peer = [0.0442]
-                elif model == "FF3":
-                    x_peer = [0.01, 0.02, -0.01]
-                elif model == "Carhart":
-                    x_peer = [0.01, 0.02, -0.01, 0.015]
-                else:
-                    continue  # Skip unknown models
-
-                if len(coefs_peer) == len(x_peer):
-                    expected_return_peer = intercept_peer + np.dot(coefs_peer, x_peer) + rf
-                    peer_returns.append(expected_return_peer)
-
-            if peer_returns:
-                st.success(f"📉 Lowest Peer Return: *{min(peer_returns):.2%}*")
-                st.success(f"📈 Highest Peer Return: *{max(peer_returns):.2%}*")
-            
-                # Save to session state for Page 3
-                st.session_state["peer_min_return"] = min(peer_returns)
-                st.session_state["peer_max_return"] = max(peer_returns)
-            
-            else:
-                st.info("No valid expected return could be calculated for peers.")
+            st.info("No valid expected return could be calculated for peers.")
 
     except Exception as e:
         st.error(f"Error calculating peer return range: {e}")
 
+    # === Monte Carlo Simulation ===
+    with st.expander("🎲 Simulate expected returns under factor uncertainty"):
+        st.markdown("Factor premia are drawn from a normal distribution (monthly, decimal).")
+        factor_names = ["Market", "SMB", "HML", "MOM"]
+        mean_cols = st.columns(4)
+        means = tuple(
+            col.number_input(f"{name} mean", value=float(default), step=0.001, format="%.4f", key=f"mc_mean_{name}")
+            for col, name, default in zip(mean_cols, factor_names, FACTOR_PREMIA["Carhart"])
+        )
+        std_cols = st.columns(4)
+        std = tuple(
+            col.number_input(f"{name} std", min_value=0.0, value=float(default), step=0.001, format="%.4f", key=f"mc_std_{name}")
+            for col, name, default in zip(std_cols, factor_names, DEFAULT_FACTOR_STD)
+        )
+        sim_cols = st.columns(3)
+        correlation = sim_cols[0].slider("Factor correlation", min_value=-0.3, max_value=0.9, value=0.0, step=0.05)
+        n_draws = sim_cols[1].selectbox("Draws", options=[10_000, 100_000, 1_000_000], index=1)
+        seed = int(sim_cols[2].number_input("Seed", min_value=0, value=42, step=1))
+
+        forward_eps = stock_info.get("forwardEps", None)
+        ticker_sim = run_simulation(
+            (ticker.upper(),), means, std, correlation, capm_premium, rf, n_draws, seed,
+            (forward_eps if forward_eps else np.nan,), use_rolling
+        )
+        labels = [f"P{p}" for p in PERCENTILES]
+        ticker_table = pd.DataFrame(
+            [ticker_sim.return_percentiles[0], ticker_sim.price_percentiles[0]],
+            index=["Expected Return", "Gordon Price"], columns=labels
+        )
+        st.dataframe(ticker_table.style.format("{:.4f}"), use_container_width=True)
+        st.caption(f"{ticker_sim.prob_valid[0]:.1%} of draws exceed the {TERMINAL_GROWTH:.0%} terminal growth rate (required for a price).")
+
+        if peer_tickers:
+            # Forward EPS from the shared market-data cache; missing peers can be fetched on demand
+            sim_peers = tuple(coeff_matrix.tickers[coeff_matrix.rows(peer_tickers)].tolist())
+            peer_info = peek_infos(sim_peers)
+            missing = [p for p in sim_peers if p not in peer_info]
+            if missing and st.button(f"Fetch forward EPS for {len(missing)} peers"):
+                with timed("expected return: peer market info"):
+                    fetched, _ = fetch_infos(missing, fields=["forwardEps"], max_workers=16, rate=25.0, budget=20.0)
+                peer_info.update(fetched)
+                missing = [p for p in sim_peers if p not in peer_info]
+            peer_eps = tuple(float(peer_info[p].get("forwardEps") or np.nan) if p in peer_info else np.nan for p in sim_peers)
+
+            # Same seed, so peers see the same factor draws as the selected ticker
+            peers_sim = run_simulation(
+                sim_peers, means, std, correlation, FORWARD_MARKET_PREMIUM,
+                rf, n_draws, seed, peer_eps, use_rolling
+            )
+            return_cols = [f"Return {label}" for label in labels]
+            peer_table = pd.concat([
+                pd.DataFrame({"Ticker": sim_peers, "Forward EPS": peer_eps}),
+                pd.DataFrame(peers_sim.return_percentiles, columns=return_cols),
+                pd.DataFrame(peers_sim.price_percentiles, columns=[f"Price {label}" for label in labels]),
+            ], axis=1)
+            st.markdown("**Peer expected-return and Gordon price percentiles**")
+            st.dataframe(peer_table.dropna(subset=return_cols), use_container_width=True, hide_index=True)
+            if missing:
+                st.caption(f"No cached forward EPS for {len(missing)} peers; their price percentiles stay blank until fetched.")
+
     # === Analyst Forecast Section ===
     st.markdown("---")
     st.subheader("📣 Expected Return by Analyst Forecasts")
@@ -1,8 +1,16 @@
 import streamlit as st
-import yfinance as yf
 import numpy as np
 import pandas as pd
 
+from finclusters import derived
+from finclusters.charts import scenario_heatmap
+from finclusters.forecast import (
+    GROWTH_RATES, RISK_FREE_RATES, TERMINAL_GROWTH, gordon_price, premium_axis, price_grid
+)
+from finclusters.instrumentation import timed
+from finclusters.market_data import fetch_infos, get_info, get_price_history
+from finclusters.price_history import TIMEFRAMES
+
 # === Get ticker from global session state ===
 ticker = st.session_state.get("ticker", "")
 
@@ -12,8 +20,8 @@ if not ticker:
 
 # === MAIN PAGE ===
 try:
-    stock = yf.Ticker(ticker)
-    stock_info = stock.info
+    with timed("price forecast: market info"):
+        stock_info = get_info(ticker)
 
     company_name = stock_info.get("longName", ticker.upper())
     forward_eps = stock_info.get("forwardEps", None)
@@ -21,32 +29,18 @@ try:
 
     st.title(f"💰 Price Forecast for {company_name}")
 
-    # === Collect model-based return from Page 2 toggle ===
-    model_return = st.session_state.get("expected_return", None)
-    terminal_growth = 0.03
-    model_price = None
-
-    # Only compute if return is valid and forwardEPS is available
-    if forward_eps and model_return is not None and model_return > terminal_growth:
-        model_price = forward_eps / (model_return - terminal_growth)
-
-    # Analyst forecast
-    analyst_price = None
-    if forward_pe and forward_eps:
-        analyst_price = forward_pe * forward_eps
+    # === Returns and prices from the derived-data layer ===
+    # Computed on demand here if Steps 1 and 2 have not been opened yet
+    model_info = derived.get('model_return')
+    model_return = model_info['expected_return'] if model_info else None
+    terminal_growth = TERMINAL_GROWTH
+    rf = derived.current_inputs()['rf']
 
-    # Peer forecast
-    peer_min_return = st.session_state.get("peer_min_return", None)
-    peer_max_return = st.session_state.get("peer_max_return", None)
-
-    peer_price_min = None
-    peer_price_max = None
-
-    if forward_eps and peer_min_return is not None and peer_max_return is not None:
-        if peer_max_return > terminal_growth:
-            peer_price_min = forward_eps / (peer_max_return - terminal_growth)
-        if peer_min_return > terminal_growth:
-            peer_price_max = forward_eps / (peer_min_return - terminal_growth)
+    forecast_prices = derived.get('prices')
+    model_price = forecast_prices['model_price']
+    analyst_price = forecast_prices['analyst_price']
+    peer_price_min = forecast_prices['peer_price_min']
+    peer_price_max = forecast_prices['peer_price_max']
 
     # === Forecasted Price Summary ===
     st.subheader("📌 Forecasted Prices")
@@ -69,6 +63,49 @@ try:
         forecast_df = pd.DataFrame(forecast_data, columns=["Estimate Type", "Price"])
         st.dataframe(forecast_df, use_container_width=True, hide_index=True)
 
+    # === Price Sensitivity ===
+    if forward_eps and model_return is not None:
+        with st.expander("🧮 Price sensitivity to return, growth and risk-free rate"):
+            # Whole grid is computed at once; the slider under the chart switches risk-free rate in the browser
+            with timed("price forecast: sensitivity grid"):
+                premia = premium_axis(model_return - rf)
+                grid = price_grid(forward_eps, premia, GROWTH_RATES, RISK_FREE_RATES)
+                st.plotly_chart(
+                    scenario_heatmap(grid, premia, GROWTH_RATES, RISK_FREE_RATES, current_rf=rf),
+                    use_container_width=True
+                )
+            st.caption("Blank cells are scenarios where the expected return does not exceed terminal growth.")
+
+    # === Peer Price Forecasts ===
+    peer_tickers = derived.get('peers')
+    if peer_tickers and st.toggle(f"Show price forecasts for all {len(peer_tickers)} peers", value=False):
+        # Live data for the whole cluster is fetched concurrently (and cached)
+        with timed("price forecast: peer market info"):
+            peer_info, peer_failures = fetch_infos(
+                peer_tickers, fields=["currentPrice", "forwardEps", "forwardPE"],
+                max_workers=16, rate=25.0, budget=20.0
+            )
+
+        return_by_ticker = derived.get('peer_returns')
+
+        peer_data = []
+        for peer in peer_tickers:
+            info = peer_info.get(peer)
+            if info is None:
+                continue
+            peer_return = return_by_ticker.get(peer, np.nan)
+            peer_eps = info["forwardEps"]
+            peer_price = gordon_price(peer_eps, peer_return, terminal_growth)
+            peer_data.append((peer, info["currentPrice"], peer_eps, peer_return, peer_price))
+
+        st.subheader("🏢 Peer Price Forecasts")
+        peer_df = pd.DataFrame(
+            peer_data, columns=["Ticker", "Current Price", "Forward EPS", "Expected Return", "Model-Based Price"]
+        )
+        st.dataframe(peer_df, use_container_width=True, hide_index=True)
+        if peer_failures:
+            st.caption(f"Market data unavailable for {len(peer_failures)} peers: {', '.join(sorted(peer_failures))}")
+
     # === Price Chart ===
     st.markdown("---")
     st.subheader(f"📉 {ticker} Share Price")
@@ -83,29 +120,17 @@ try:
     # Let user select time frame
     timeframe = st.radio(
         "Select Time Frame",
-        options=["1M", "3M", "6M", "1Y", "2Y", "5Y", "Max"],
+        options=list(TIMEFRAMES),
         index=3,
         horizontal=True
     )
-        
-    # Map selection to yfinance period
-    def map_timeframe(duration):
-        mapping = {
-            "1M": "1mo",
-            "3M": "3mo",
-            "6M": "6mo",
-            "1Y": "1y",
-            "2Y": "2y",
-            "5Y": "5y",
-            "Max": "max"
-        }
-        return mapping.get(duration, "1y")
-    
-    period = map_timeframe(timeframe)
-    hist = stock.history(period=period)
+
+    # Full history is fetched once per ticker; each time frame is a slice of it
+    with timed("price forecast: price history"):
+        hist = get_price_history(ticker).series(timeframe)
     
     if not hist.empty:
-        st.line_chart(hist["Close"], use_container_width=True)
+        st.line_chart(hist, use_container_width=True)
     else:
         st.info(f"{timeframe} price data not available.")
 
@@ -0,0 +1,51 @@
+import streamlit as st
+
+from finclusters import derived
+from finclusters.instrumentation import timed
+from finclusters.returns import FORWARD_MARKET_PREMIUM
+from finclusters.screener import load_screen
+
+st.title("🔎 Universe Screener")
+st.markdown("Every ticker in the model coefficient table and the active company list, ranked by model expected return.")
+
+# === Screen Inputs ===
+# Seeded like Step 2 (session rate, else the current 10-year yield) and shared back with it
+if "screener_rf_input" not in st.session_state:
+    st.session_state["screener_rf_input"] = round(derived.current_inputs()['rf'] * 100, 2)
+col_rf, col_premium = st.columns(2)
+rf_percent = col_rf.number_input("Risk-Free Rate (%)", min_value=0.0, max_value=100.0, key="screener_rf_input")
+st.session_state["risk_free_rate"] = rf_percent / 100
+use_forward = col_premium.toggle("Use forward-looking market premium?", value=True)
+
+with timed("screener: screen"):
+    screen = load_screen(rf_percent / 100, FORWARD_MARKET_PREMIUM if use_forward else None)
+
+# === Filters ===
+with st.expander("Filters", expanded=True):
+    col_sector, col_model = st.columns(2)
+    sectors = col_sector.multiselect("Sector", options=sorted(screen['Sector'].dropna().unique()))
+    models = col_model.multiselect("Model", options=sorted(screen['Model'].dropna().unique()))
+    only_modelled = st.checkbox("Only tickers with an expected return", value=True)
+    only_priced = st.checkbox("Only tickers with cached market data (implied price)", value=False)
+
+filtered = screen
+if sectors:
+    filtered = filtered[filtered['Sector'].isin(sectors)]
+if models:
+    filtered = filtered[filtered['Model'].isin(models)]
+if only_modelled:
+    filtered = filtered[filtered['Expected Return'].notna()]
+if only_priced:
+    filtered = filtered[filtered['Implied Price'].notna()]
+
+st.caption(f"{len(filtered)} of {len(screen)} tickers. Click a column header to sort.")
+st.dataframe(
+    filtered,
+    use_container_width=True,
+    hide_index=True,
+    column_config={
+        'Expected Return': st.column_config.NumberColumn(format="percent"),
+        'Peer Percentile': st.column_config.NumberColumn(format="%.0f"),
+        'Upside': st.column_config.NumberColumn(format="percent"),
+    },
+)
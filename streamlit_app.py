@@ -1,6 +1,14 @@
 # The app structure is cloned from Professor Wysocki's Multipage Template and the team made adjustments for the FinClusters App
+import time
+
 import streamlit as st
 
+from finclusters import instrumentation
+from finclusters.warmup import DEBUG, record_first_interaction, start_warmup
+
+# **** Preload sector models and data in the background ****
+start_warmup()
+
 # **** Page layout setup ****
 App_page_0 = st.Page(
     "pages/0_main.py",
@@ -23,12 +31,16 @@ App_page_4 = st.Page(
     "pages/4_Price_Forecast.py",
     title="Step 3: Price Forecast"
 )
+App_page_5 = st.Page(
+    "pages/5_Screener.py",
+    title="Universe Screener"
+)
 
 # **** Set up navigation with section headers ****
 pg = st.navigation(
     {
         "Start Here:": [App_page_0, App_page_1],
-        "Explore Analysis:": [App_page_2, App_page_3, App_page_4],
+        "Explore Analysis:": [App_page_2, App_page_3, App_page_4, App_page_5],
     }
 )
 
@@ -40,4 +52,30 @@ with st.sidebar:
     
 
 # **** Execute the navigation code ****
-pg.run()
+run_start = time.perf_counter()
+with instrumentation.timed(f"page: {pg.title}"):
+    pg.run()
+record_first_interaction(time.perf_counter() - run_start)
+
+# **** Debug instrumentation panel (FINCLUSTERS_DEBUG=1) ****
+if DEBUG:
+    # pandas is only needed for the panel; keep it off the cold-start path otherwise
+    import pandas as pd
+
+    with st.sidebar.expander("⏱️ Instrumentation"):
+        metrics = instrumentation.snapshot()
+        timers = pd.DataFrame.from_dict(metrics['timers'], orient='index')
+        if not timers.empty:
+            st.markdown("**Stage timings (s)**")
+            st.dataframe(timers.sort_values('total', ascending=False).round(4), use_container_width=True)
+        counters = pd.DataFrame(
+            [(metric, name, value) for metric, values in metrics['counters'].items() for name, value in values.items()],
+            columns=["Metric", "Name", "Count"],
+        )
+        if not counters.empty:
+            st.markdown("**Cache and network counters**")
+            st.dataframe(counters, use_container_width=True, hide_index=True)
+        st.download_button("Download JSON", instrumentation.to_json(metrics), "finclusters_metrics.json", "application/json")
+        st.download_button("Download Prometheus", instrumentation.to_prometheus(metrics), "finclusters_metrics.prom", "text/plain")
+        if st.button("Reset counters"):
+            instrumentation.reset()